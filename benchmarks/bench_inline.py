@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк поиска по колоде для inline-режима
+
+Запуск: python benchmarks/bench_inline.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.data.tarot_cards import tarot_deck
+from bot.models.card import TarotCard
+from bot.services.card_index import CardIndex, normalize
+
+
+def build_queries(cards):
+    """Все префиксы слов из названий и значений карт"""
+    queries = {''}
+    for card in cards:
+        for word in normalize(f"{card.name} {card.meaning}").split():
+            for end in range(1, len(word) + 1):
+                queries.add(word[:end])
+    return sorted(queries)
+
+
+def run(index, queries, rounds):
+    """Среднее время одного запроса в микросекундах"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            index.search(query)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(queries)) * 1e6
+
+
+def main():
+    cards = [TarotCard(name=card['name'], meaning=card['meaning']) for card in tarot_deck]
+    queries = build_queries(cards)
+
+    start = time.perf_counter()
+    index = CardIndex(cards, memo_size=0)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    cold = run(index, queries, rounds=3)
+
+    memo_index = CardIndex(cards, memo_size=len(queries) + 1)
+    run(memo_index, queries, rounds=1)
+    warm = run(memo_index, queries, rounds=20)
+
+    print(f"🎴 Карт в колоде: {len(cards)}, запросов: {len(queries)}")
+    print(f"🔨 Построение индекса: {build_ms:.2f} мс")
+    print(f"❄️  Без кэша запросов: {cold:.2f} мкс/запрос")
+    print(f"🔥 С кэшем запросов:  {warm:.2f} мкс/запрос")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк рендеринга персональных изображений карт (нужен Pillow)
+
+Запуск: python benchmarks/bench_render.py [количество изображений]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.services.render_service import PIL_AVAILABLE, render_base_layer, render_personal_layer
+
+
+def run(workers, base_path, directory, count):
+    """Отрендерить count изображений в пуле из workers процессов, вернуть renders/sec"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Прогрев: запуск процессов не входит в замер
+        list(executor.map(render_personal_layer, [base_path] * workers, ['daily'] * workers,
+                          ['01.01.2025'] * workers, ['warmup'] * workers, [None] * workers,
+                          [os.path.join(directory, f"warmup-{i}.jpg") for i in range(workers)]))
+
+        start = time.perf_counter()
+        futures = [
+            executor.submit(render_personal_layer, base_path, 'daily', '01.01.2025',
+                            f"Читатель {i}", None, os.path.join(directory, f"bench-{i}.jpg"))
+            for i in range(count)
+        ]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+
+    return count / elapsed
+
+
+def main():
+    if not PIL_AVAILABLE:
+        print("❌ Pillow не установлен: pip install Pillow")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cores = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        base_path = render_base_layer('Колесо Фортуны', None, 'daily', None,
+                                      os.path.join(directory, 'base.png'))
+
+        single = run(1, base_path, directory, count)
+        print(f"🎨 1 процесс: {single:.1f} изображений/с")
+
+        if cores > 1:
+            multi = run(cores, base_path, directory, count)
+            print(f"🎨 {cores} процессов: {multi:.1f} изображений/с ({multi / cores:.1f} на ядро)")
+
+
+if __name__ == '__main__':
+    main()
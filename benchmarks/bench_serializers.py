@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк форматов файла базы: размер и скорость кодирования/декодирования
+
+Для каждого установленного сериализатора (json, compact, orjson, msgspec, binary)
+кодируется база из синтетических пользователей. Скорость считается в МБ/с
+относительно размера исходного JSON с отступами, чтобы форматы сравнивались на одних данных.
+
+Запуск: python benchmarks/bench_serializers.py [--users 100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:benchmark')
+
+from bot.services import serializers
+from bot.services.serializers import (
+    BinarySerializer, CompactJSONSerializer, MsgspecSerializer, OrjsonSerializer, PrettyJSONSerializer,
+)
+from suite import make_users
+
+
+def best_of(func, repeats: int) -> float:
+    """Минимальное время из нескольких запусков"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк форматов базы пользователей")
+    parser.add_argument('--users', type=int, default=100_000, help="число пользователей в базе")
+    parser.add_argument('--repeats', type=int, default=3, help="запусков на замер")
+    args = parser.parse_args()
+
+    data = make_users(args.users)
+    candidates = [
+        (True, PrettyJSONSerializer),
+        (True, CompactJSONSerializer),
+        (serializers.ORJSON_AVAILABLE, OrjsonSerializer),
+        (serializers.MSGSPEC_AVAILABLE, MsgspecSerializer),
+        (serializers.MSGPACK_AVAILABLE, BinarySerializer),
+    ]
+
+    reference_mb = len(PrettyJSONSerializer().dumps(data)) / 1e6
+    print(f"👥 Пользователей: {args.users}, JSON с отступами: {reference_mb:.1f} МБ")
+    print(f"{'формат':<10} {'размер МБ':>10} {'запись МБ/с':>12} {'чтение МБ/с':>12} {'запись мс':>10} {'чтение мс':>10}")
+    for available, factory in candidates:
+        if not available:
+            print(f"{factory.name:<10} {'не установлен':>10}")
+            continue
+        serializer = factory()
+        raw = serializer.dumps(data)
+        assert serializer.loads(raw) == data, f"{serializer.name}: данные не совпадают после чтения"
+
+        encode = best_of(lambda: serializer.dumps(data), args.repeats)
+        decode = best_of(lambda: serializer.loads(raw), args.repeats)
+        print(
+            f"{serializer.name:<10} {len(raw) / 1e6:>10.1f} {reference_mb / encode:>12.0f} "
+            f"{reference_mb / decode:>12.0f} {encode * 1000:>10.0f} {decode * 1000:>10.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
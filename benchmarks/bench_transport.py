@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк HTTP транспорта Bot API на локальной заглушке
+
+Заглушка отвечает на любой метод после заданной задержки, getUpdates держит
+соединение как настоящий long polling. Для каждой конфигурации пула измеряется
+число sendMessage в секунду через настоящий telegram.Bot (параллельно идёт getUpdates)
+и число открытых за замер соединений.
+
+Запуск: python benchmarks/bench_transport.py [--seconds 3] [--concurrency 64] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:bench')
+
+import httpx
+from telegram import Bot
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
+
+from bot.config import Config
+from bot.utils.transport import build_request
+
+TOKEN = '1:bench'
+
+RESULTS = {
+    'getMe': {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'},
+    'sendMessage': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'ok'},
+    'getUpdates': [],
+}
+
+
+class StubBotAPI:
+    """Минимальный HTTP/1.1 сервер Bot API с keep-alive (в том же event loop, что и клиент)"""
+
+    def __init__(self, latency: float, poll_seconds: float):
+        self.latency = latency
+        self.poll_seconds = poll_seconds
+        self.connections = 0
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                lines = head.decode('latin-1').split('\r\n')
+                method = lines[0].split()[1].rsplit('/', 1)[-1]
+                headers = {
+                    name.lower(): value
+                    for name, value in (line.split(': ', 1) for line in lines[1:] if ': ' in line)
+                }
+                length = int(headers.get('content-length', 0))
+                if length:
+                    await reader.readexactly(length)
+
+                await asyncio.sleep(self.poll_seconds if method == 'getUpdates' else self.latency)
+                body = json.dumps({'ok': True, 'result': RESULTS.get(method, True)}).encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Клиент закрыл соединение или замер окончен
+            return
+        finally:
+            writer.close()
+
+
+def plain_request(pool_size: int, keepalive: bool) -> HTTPXRequest:
+    """Запрос с заданным пулом (keepalive=False - новое соединение на каждый вызов)"""
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size if keepalive else 0,
+    )
+    return HTTPXRequest(connection_pool_size=pool_size, pool_timeout=None, httpx_kwargs={'limits': limits})
+
+
+async def long_poll(bot: Bot, stop: asyncio.Event):
+    """Имитация Updater: getUpdates подряд, пока идёт замер"""
+    while not stop.is_set():
+        await bot.get_updates(timeout=10, read_timeout=30, pool_timeout=None)
+
+
+async def run_scenario(stub: StubBotAPI, port: int, request: HTTPXRequest, updates_request: HTTPXRequest,
+                       seconds: float, concurrency: int) -> tuple:
+    """sendMessage в секунду за окно замера и число открытых соединений.
+
+    Замер идёт фиксированное время, а не фиксированное число отправок: в общем пуле
+    long polling может надолго занять соединение, и отправки не завершатся вовсе.
+    """
+    base_url = f"http://127.0.0.1:{port}/bot"
+    bot = Bot(TOKEN, base_url=base_url, request=request, get_updates_request=updates_request)
+    await bot.initialize()
+    stub.connections = 0
+
+    stop = asyncio.Event()
+    poller = asyncio.create_task(long_poll(bot, stop))
+    await asyncio.sleep(0.05)
+
+    sent = errors = 0
+
+    async def sender():
+        nonlocal sent, errors
+        while not stop.is_set():
+            try:
+                await bot.send_message(chat_id=1, text='🔮')
+                sent += 1
+            except TelegramError:
+                errors += 1
+
+    start = time.perf_counter()
+    senders = [asyncio.create_task(sender()) for _ in range(concurrency)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    rate = sent / elapsed
+
+    for task in (poller, *senders):
+        task.cancel()
+    await asyncio.gather(poller, *senders, return_exceptions=True)
+    await bot.shutdown()
+    return rate, stub.connections, errors
+
+
+async def main_async(args):
+    stub = StubBotAPI(args.latency_ms / 1000, poll_seconds=0.5)
+    port = await stub.start()
+
+    config = Config()
+    scenarios = [
+        # (название, запрос для вызовов, запрос для getUpdates; None - общий пул)
+        ("общий пул 1 (getUpdates и отправка)", plain_request(1, True), None),
+        ("пул 8 без keep-alive", plain_request(8, False), plain_request(1, True)),
+        ("пул 8 с keep-alive", plain_request(8, True), plain_request(1, True)),
+        ("пул 32 с keep-alive", plain_request(32, True), plain_request(1, True)),
+        (f"из конфигурации (пул {config.telegram_pool_size})",
+         build_request(config), build_request(config, get_updates=True)),
+    ]
+
+    print(f"📡 Заглушка Bot API: задержка {args.latency_ms} мс, замер: {args.seconds} с, "
+          f"одновременно: {args.concurrency}")
+    print(f"{'конфигурация':<42} {'отправок/с':>12} {'соединений':>12} {'ошибок':>8}")
+    try:
+        for label, request, updates_request in scenarios:
+            shared = updates_request is None
+            # Без отдельного запроса getUpdates делит пул с отправкой, как один общий клиент
+            rate, connections, errors = await run_scenario(
+                stub, port, request, request if shared else updates_request, args.seconds, args.concurrency
+            )
+            print(f"{label:<42} {rate:>12.0f} {connections:>12} {errors:>8}")
+    finally:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк транспорта Bot API")
+    parser.add_argument('--seconds', type=float, default=3.0, help="длительность каждого замера")
+    parser.add_argument('--concurrency', type=int, default=64, help="одновременных отправок")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="задержка ответа заглушки")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
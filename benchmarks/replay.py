@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Воспроизведение синтетического трафика через настоящий стек обработчиков TarotBot
+
+Telegram не используется: исходящие вызовы Bot API перехватывает FakeRequest,
+который записывает их и имитирует задержку API. Трафик, задержки и выбор карт
+определяются seed, поэтому результаты сравнимы между релизами: задержка каждого
+вызова выводится из (seed, update_id, номер вызова), а не из порядка завершения задач,
+карты и шаблоны - из детерминированного расклада с секретом от seed, даты сообщений
+фиксированы. Карты зависят ещё и от текущей даты, как в самом боте.
+
+Запуск:
+    python benchmarks/replay.py --users 2000
+    python benchmarks/replay.py --users 50000 --seed 7 --output replay.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '0:replay')
+
+from telegram import Update
+from telegram.request import BaseRequest, RequestData
+
+from bot.bot import TarotBot
+from bot.config import Config
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Tarot', 'username': 'tarot_replay_bot'}
+
+# Утренний пик: почти все тянут карту, часть впервые пишет /start, часть смотрит статистику
+FOLLOW_UPS = (('/stats', 0.25), ('/ai', 0.10), ('/fortune', 0.15))
+NEW_USER_SHARE = 0.3
+
+# Дата всех сообщений и ответов: время запуска не должно попадать в прогон
+FIXED_EPOCH = 1_750_000_000
+
+# Обновление, которое сейчас обрабатывается: задержки API выводятся из его номера
+CURRENT_UPDATE: contextvars.ContextVar[int] = contextvars.ContextVar('replay_update', default=0)
+
+
+class FakeRequest(BaseRequest):
+    """Подмена HTTP транспорта Bot API: записывает вызовы и имитирует задержку"""
+
+    def __init__(self, seed: int, latency_ms: float, jitter: float):
+        super().__init__()
+        self.seed = seed
+        # Номер следующего вызова API внутри каждого обновления
+        self._call_index: Counter = Counter()
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] += 1
+
+        if self.latency_ms:
+            update_id = CURRENT_UPDATE.get()
+            index = self._call_index[update_id]
+            self._call_index[update_id] += 1
+            rng = random.Random(f"{self.seed}:{update_id}:{index}")
+            delay = rng.lognormvariate(0, self.jitter) * self.latency_ms / 1000
+            await asyncio.sleep(delay)
+
+        parameters = request_data.parameters if request_data else {}
+        body = json.dumps({'ok': True, 'result': self._result(api_method, parameters)})
+        return 200, body.encode('utf-8')
+
+    def _result(self, api_method: str, parameters: Dict) -> object:
+        """Минимальный корректный ответ для метода Bot API"""
+        if api_method == 'getMe':
+            return BOT_USER
+        if api_method in ('sendMessage', 'editMessageText', 'sendPhoto'):
+            self._message_id += 1
+            chat_id = int(parameters.get('chat_id') or 0)
+            return {
+                'message_id': parameters.get('message_id') or self._message_id,
+                'date': FIXED_EPOCH,
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': parameters.get('text', ''),
+            }
+        return True
+
+
+def build_traffic(users: int, seed: int) -> List[Tuple[int, str]]:
+    """Последовательность (user_id, команда) утреннего пика"""
+    rng = random.Random(seed)
+    sessions = []
+    for user_id in range(100_000, 100_000 + users):
+        commands = ['/start'] if rng.random() < NEW_USER_SHARE else []
+        commands.append('/fortune')
+        for command, probability in FOLLOW_UPS:
+            if rng.random() < probability:
+                commands.append(command)
+        sessions.append((user_id, commands))
+
+    # Сессии перемешиваются, порядок команд внутри сессии сохраняется
+    rng.shuffle(sessions)
+    traffic = []
+    pending = [(user_id, list(commands)) for user_id, commands in sessions]
+    while pending:
+        batch = pending[:64]
+        pending = pending[64:]
+        while batch:
+            index = rng.randrange(len(batch))
+            user_id, commands = batch[index]
+            traffic.append((user_id, commands.pop(0)))
+            if not commands:
+                batch.pop(index)
+    return traffic
+
+
+def make_update(update_id: int, user_id: int, command: str) -> Dict:
+    """JSON обновления с командой от пользователя в личном чате"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"Гость{user_id % 1000}", 'language_code': 'ru'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': FIXED_EPOCH,
+            'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+            'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        },
+    }
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(share * (len(values) - 1))))
+    return values[index]
+
+
+async def replay(args) -> Dict:
+    """Прогнать трафик через приложение и собрать статистику"""
+    directory = tempfile.mkdtemp(prefix='tarot-replay-')
+    try:
+        config = Config()
+        config.groq_api_key = None
+        config.data_dir = directory
+        config.user_data_file = os.path.join(directory, 'users_data.json')
+        config.analytics_file = os.path.join(directory, 'analytics.bin')
+        config.cold_storage_dir = os.path.join(directory, 'cold')
+        config.leaderboard_file = os.path.join(directory, 'leaderboard.json')
+        config.group_cards_file = os.path.join(directory, 'group_cards.json')
+        # Карта и шаблон выводятся из (пользователь, дата, секрет), а не из порядка обработки
+        config.deterministic_draw = True
+        config.draw_secret = f"replay:{args.seed}"
+        random.seed(args.seed)
+
+        request = FakeRequest(args.seed, args.api_latency_ms, args.api_jitter)
+        bot = TarotBot(config, request=request)
+        application = bot.application
+
+        traffic = build_traffic(args.users, args.seed)
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        # Последнее обновление каждого пользователя: команды одной сессии идут по очереди,
+        # как у настоящего пользователя, который ждёт ответа, и не обгоняют друг друга
+        previous: Dict[int, asyncio.Future] = {}
+
+        async def process(update_id: int, user_id: int, command: str, before: Optional[asyncio.Future],
+                          done: asyncio.Future):
+            update = Update.de_json(make_update(update_id, user_id, command), application.bot)
+            try:
+                if before is not None:
+                    await before
+                async with semaphore:
+                    CURRENT_UPDATE.set(update_id)
+                    start = time.perf_counter()
+                    await application.process_update(update)
+                    latencies[command].append(time.perf_counter() - start)
+            finally:
+                done.set_result(None)
+
+        def schedule(update_id: int, user_id: int, command: str):
+            done = asyncio.get_running_loop().create_future()
+            before = previous.get(user_id)
+            previous[user_id] = done
+            return process(update_id, user_id, command, before, done)
+
+        async with application:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                schedule(update_id, user_id, command)
+                for update_id, (user_id, command) in enumerate(traffic, start=1)
+            ))
+            elapsed = time.perf_counter() - start
+
+        storage_bytes = os.path.getsize(config.user_data_file) if os.path.exists(config.user_data_file) else 0
+        return {
+            'seed': args.seed,
+            'users': args.users,
+            'updates': len(traffic),
+            'concurrency': args.concurrency,
+            'elapsed_seconds': elapsed,
+            'updates_per_second': len(traffic) / elapsed if elapsed else 0.0,
+            'latency_ms': {
+                command: {
+                    'count': len(values),
+                    'p50': percentile(sorted(values), 0.50) * 1000,
+                    'p95': percentile(sorted(values), 0.95) * 1000,
+                    'p99': percentile(sorted(values), 0.99) * 1000,
+                }
+                for command, values in sorted(latencies.items())
+            },
+            'api_calls': dict(sorted(request.calls.items())),
+            'storage_bytes': storage_bytes,
+            'storage_bytes_per_user': storage_bytes / args.users if args.users else 0.0,
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_report(report: Dict):
+    """Вывести отчёт в консоль"""
+    print(f"🎲 seed={report['seed']}, пользователей: {report['users']}, обновлений: {report['updates']}")
+    print(f"⚡ {report['updates_per_second']:.1f} обновлений/с за {report['elapsed_seconds']:.1f} с")
+    print(f"\n{'команда':<12} {'кол-во':>8} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9}")
+    for command, stats in report['latency_ms'].items():
+        print(f"{command:<12} {stats['count']:>8} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+    print(f"\n📡 Вызовы Bot API: {report['api_calls']}")
+    print(f"💾 Хранилище: {report['storage_bytes'] / 1024:.1f} КБ ({report['storage_bytes_per_user']:.0f} байт на пользователя)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон синтетического трафика")
+    parser.add_argument('--users', type=int, default=50_000, help="число разных пользователей")
+    parser.add_argument('--seed', type=int, default=42, help="seed трафика и задержек")
+    parser.add_argument('--concurrency', type=int, default=64, help="одновременно обрабатываемых обновлений")
+    parser.add_argument('--api-latency-ms', type=float, default=40.0, help="медианная задержка Bot API")
+    parser.add_argument('--api-jitter', type=float, default=0.5, help="разброс задержки (sigma логнормального)")
+    parser.add_argument('--output', help="записать отчёт в JSON файл")
+    args = parser.parse_args()
+
+    report = asyncio.run(replay(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
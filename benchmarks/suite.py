@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Набор микробенчмарков хранилища, сервисов и форматирования
+
+Запуск:
+    python benchmarks/suite.py                  # сравнить с benchmarks/baseline.json
+    python benchmarks/suite.py --save-baseline  # записать новый baseline
+    python benchmarks/suite.py --full           # добавить размер 1M пользователей
+    python benchmarks/suite.py -k database      # только бенчмарки с подстрокой в имени
+
+Код выхода 1, если какой-либо бенчмарк медленнее baseline больше чем на --threshold.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '0:benchmark')
+
+from bot.config import Config
+from bot.data.tarot_cards import tarot_deck
+from bot.models.card import TarotCard
+from bot.services.analytics_service import AnalyticsService
+from bot.services.database import Database
+from bot.services.fortune_service import FortuneService
+from bot.services.user_service import UserService
+
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_SIZES = (1_000, 100_000)
+FULL_SIZES = (1_000, 100_000, 1_000_000)
+
+# Бенчмарк: имя -> (функция подготовки, зависит ли от числа пользователей)
+BENCHMARKS: Dict[str, Tuple[Callable, bool]] = {}
+
+
+def benchmark(name: str, sized: bool = False):
+    """Зарегистрировать бенчмарк. Подготовка возвращает функцию для замера (обычную или async)."""
+    def decorator(setup: Callable) -> Callable:
+        BENCHMARKS[name] = (setup, sized)
+        return setup
+    return decorator
+
+
+class FakeAIService:
+    """AI сервис без сети: мгновенно возвращает фиксированное толкование"""
+    ai_available = True
+
+    def cached_interpretation(self, card_name: str, user_name: Optional[str] = None,
+                              day: Optional[str] = None) -> Optional[str]:
+        return None
+
+    async def generate_interpretation(self, card_name: str, user_name: Optional[str] = None,
+                                      day: Optional[str] = None) -> str:
+        return f"🌟 Карта {card_name} приносит ясность. Действуйте спокойно. ✨ Доверьтесь себе."
+
+
+def make_config(directory: str) -> Config:
+    """Конфигурация с базой во временной директории"""
+    config = Config()
+    config.data_dir = directory
+    config.user_data_file = os.path.join(directory, 'users_data.json')
+    config.analytics_file = os.path.join(directory, 'analytics.bin')
+    config.cold_storage_dir = os.path.join(directory, 'cold')
+    config.leaderboard_file = os.path.join(directory, 'leaderboard.json')
+    return config
+
+
+def make_users(users: int) -> Dict[str, Dict]:
+    """Синтетические пользователи в формате файла базы"""
+    today = date.today()
+    return {
+        str(user_id): {
+            'user_id': user_id,
+            'last_fortune_date': (today - timedelta(days=user_id % 30 + 1)).isoformat(),
+            'total_fortunes': user_id % 50,
+            'first_name': f"Пользователь{user_id}",
+            'created_at': (today - timedelta(days=user_id % 365 + 30)).isoformat(),
+            'use_ai': user_id % 3 != 0,
+        }
+        for user_id in range(1, users + 1)
+    }
+
+
+def populate(config: Config, users: int):
+    """Заполнить базу синтетическими пользователями"""
+    Database(config.user_data_file).save_all_data(make_users(users))
+
+
+@benchmark('database.get_user_data', sized=True)
+def bench_get_user_data(config: Config, users: int):
+    db = Database(config.user_data_file)
+    ids = itertools.cycle(range(1, users + 1, max(1, users // 97)))
+    return lambda: db.get_user_data(next(ids))
+
+
+@benchmark('database.save_user_data', sized=True)
+def bench_save_user_data(config: Config, users: int):
+    db = Database(config.user_data_file)
+    ids = itertools.cycle(range(1, users + 1, max(1, users // 97)))
+    record = {'total_fortunes': 1, 'first_name': 'Аня', 'last_fortune_date': None, 'use_ai': True}
+    return lambda: db.save_user_data(next(ids), record)
+
+
+@benchmark('database.get_stats', sized=True)
+def bench_get_stats(config: Config, users: int):
+    db = Database(config.user_data_file)
+    return db.get_stats
+
+
+@benchmark('user_service.get_user_hot', sized=True)
+def bench_get_user_hot(config: Config, users: int):
+    service = UserService(config)
+    ids = list(range(1, users + 1, max(1, users // 97)))
+    for user_id in ids:
+        service.get_user(user_id)
+    ids = itertools.cycle(ids)
+    return lambda: service.get_user(next(ids))
+
+
+@benchmark('user_service.record_fortune', sized=True)
+def bench_record_fortune(config: Config, users: int):
+    service = UserService(config)
+    ids = itertools.cycle(range(1, users + 1, max(1, users // 97)))
+    return lambda: service.record_fortune(next(ids), 'Аня')
+
+
+@benchmark('user_service.get_all_stats', sized=True)
+def bench_get_all_stats(config: Config, users: int):
+    service = UserService(config)
+    return service.get_all_stats
+
+
+@benchmark('fortune_service.get_daily_fortune', sized=True)
+def bench_get_daily_fortune(config: Config, users: int):
+    service = FortuneService(config, FakeAIService(), UserService(config))
+    # Каждый вызов - новый пользователь, иначе сработает дневное ограничение
+    ids = itertools.count(users + 1)
+
+    async def run():
+        await service.get_daily_fortune(next(ids), 'Аня')
+    return run
+
+
+@benchmark('analytics.record_fortune')
+def bench_analytics_record(config: Config, users: int):
+    service = AnalyticsService(config)
+    cards = itertools.cycle(range(78))
+    return lambda: service.record_fortune(next(cards), ai_used=True)
+
+
+@benchmark('analytics.get_range_90')
+def bench_analytics_range(config: Config, users: int):
+    service = AnalyticsService(config)
+    service.record_fortune(0, ai_used=False)
+    return lambda: service.get_range(90)
+
+
+@benchmark('fortune_service.format_fortune_response')
+def bench_format_fortune_response(config: Config, users: int):
+    service = FortuneService(config, FakeAIService(), UserService(config))
+    card = service.cards[10]
+    result = {
+        'success': True,
+        'card': card,
+        'message': service._format_classic_fortune(card),
+        'stats': {'total_fortunes': 15, 'last_fortune_date': date.today().isoformat()},
+        'ai_used': False,
+    }
+    return lambda: service.format_fortune_response('Аня', result)
+
+
+@benchmark('models.tarot_card_construction')
+def bench_tarot_card(config: Config, users: int):
+    cards = itertools.cycle(tarot_deck)
+
+    def run():
+        card = next(cards)
+        TarotCard(name=card['name'], meaning=card['meaning'])
+    return run
+
+
+def measure(func: Callable, min_time: float = 0.2, repeats: int = 3) -> float:
+    """Время одного вызова в секундах (минимум из нескольких серий)"""
+    if asyncio.iscoroutinefunction(func):
+        async def batch(number: int):
+            for _ in range(number):
+                await func()
+
+        def timed(number: int) -> float:
+            start = time.perf_counter()
+            asyncio.run(batch(number))
+            return time.perf_counter() - start
+    else:
+        def timed(number: int) -> float:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            return time.perf_counter() - start
+
+    # Подобрать число вызовов в серии так, чтобы серия длилась не меньше min_time
+    number = 1
+    while True:
+        elapsed = timed(number)
+        if elapsed >= min_time or number >= 100_000:
+            break
+        number = min(100_000, max(number * 2, int(number * min_time / max(elapsed, 1e-9))))
+
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        best = min(best, timed(number) / number)
+    return best
+
+
+def run_benchmarks(sizes, keyword: Optional[str]) -> Dict[str, float]:
+    """Выполнить бенчмарки, вернуть {имя: секунд на вызов}"""
+    results = {}
+    for name, (setup, sized) in BENCHMARKS.items():
+        if keyword and keyword not in name:
+            continue
+
+        for users in (sizes if sized else (0,)):
+            key = f"{name}[{users}]" if sized else name
+            directory = tempfile.mkdtemp(prefix='tarot-bench-')
+            try:
+                config = make_config(directory)
+                if users:
+                    populate(config, users)
+                results[key] = measure(setup(config, users))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+            print(f"  {key:<55} {format_time(results[key]):>12}", flush=True)
+    return results
+
+
+def format_time(seconds: float) -> str:
+    """Время в удобных единицах"""
+    if seconds >= 1:
+        return f"{seconds:.2f} с"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} мс"
+    return f"{seconds * 1e6:.2f} мкс"
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Найти регрессии относительно baseline"""
+    regressions = []
+    print(f"\n{'бенчмарк':<57} {'baseline':>12} {'сейчас':>12} {'изменение':>10}")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"  {key:<55} {'-':>12} {format_time(current):>12} {'новый':>10}")
+            continue
+
+        change = current / previous - 1
+        marker = ''
+        if change > threshold:
+            marker = ' ❌'
+            regressions.append(key)
+        print(f"  {key:<55} {format_time(previous):>12} {format_time(current):>12} {change:>+9.0%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки Tarot Fortune Bot")
+    parser.add_argument('--full', action='store_true', help="добавить размер 1M пользователей")
+    parser.add_argument('-k', dest='keyword', help="запускать только бенчмарки с подстрокой в имени")
+    parser.add_argument('--save-baseline', action='store_true', help="записать результаты как baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="допустимое замедление (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sizes = FULL_SIZES if args.full else DEFAULT_SIZES
+    print("⏱️  Бенчмарки (время одного вызова):")
+    results = run_benchmarks(sizes, args.keyword)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write('\n')
+        print(f"\n💾 Baseline сохранён: {BASELINE_FILE}")
+        return
+
+    if not baseline:
+        print("\n⚠️ Baseline не найден, запустите с --save-baseline")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ Регрессии больше {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ Регрессий нет")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,81 +3,284 @@
 Основной класс Telegram бота
 """
 
+import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+import signal
+from typing import Optional
+from telegram import Update
+from telegram.request import BaseRequest
+from telegram.ext import Application, CommandHandler, ContextTypes, InlineQueryHandler, MessageHandler, TypeHandler, filters
 
 from .config import Config
 from .services.ai_service import AIService
 from .services.user_service import UserService
-from .services.fortune_service import FortuneService
+from .services.analytics_service import AnalyticsService
+from .services.fortune_service import FortuneService, shared_deck
+from .services.spread_service import SpreadService
+from .services.group_service import GroupFortuneService
+from .services.image_service import ImageService
+from .services.render_service import RenderService
 from .data.tarot_cards import get_total_cards, get_cards_by_type
+from .utils.loop_monitor import LoopMonitor
+from .utils.metrics import MetricsServer, instrument_handler, watch_event_loop
+from .utils.profiling import Profiler
+from .utils.tracing import TRACER, trace_handler
+from .utils.transport import build_request, describe as describe_transport
 
 # Импорт обработчиков
 from .handlers.basic import BasicHandlers
 from .handlers.fortune import FortuneHandlers
+from .handlers.spread import SpreadHandlers
 from .handlers.stats import StatsHandlers
 from .handlers.ai import AIHandlers
 from .handlers.admin import AdminHandlers
 from .handlers.messages import MessageHandlers
+from .handlers.inline import InlineHandlers
+from .handlers.throttle import ThrottleHandlers
 
 logger = logging.getLogger(__name__)
 
-class TarotBot:
-    """Основной класс Tarot Fortune Bot"""
+ALLOWED_UPDATES = ['message', 'callback_query', 'inline_query']
+
+class BotInstance:
+    """Один бот (токен) в процессе: собственные хранилища, сервисы и Application"""
     
-    def __init__(self, config: Config):
-        """Инициализация бота"""
+    def __init__(self, bot: 'TarotBot', config: Config, request: Optional[BaseRequest] = None):
+        """Инициализация бота на общих ресурсах процесса"""
         self.config = config
         
-        # Инициализация сервисов
-        self.ai_service = AIService(config)
+        # Хранилища в пространстве имён бота, AI и колода - общие
         self.user_service = UserService(config)
-        self.fortune_service = FortuneService(config, self.ai_service, self.user_service)
+        self.analytics_service = AnalyticsService(config)
+        self.fortune_service = FortuneService(config, bot.ai_service, self.user_service, self.analytics_service)
+        self.spread_service = SpreadService(config, self.fortune_service, bot.ai_service, self.user_service)
+        self.group_service = GroupFortuneService(config, self.fortune_service) if config.group_daily_card else None
+        self.image_service = None
+        if config.card_images_enabled or bot.render_service:
+            # file_id изображений привязаны к боту, поэтому индекс свой у каждого
+            self.image_service = ImageService(config, bot.render_service)
+        self._archive_task: Optional[asyncio.Task] = None
         
         # Создание приложения
-        self.application = Application.builder().token(config.bot_token).build()
+        builder = (
+            Application.builder()
+            .token(config.bot_token)
+            .post_init(bot._post_init)
+            .post_shutdown(bot._post_shutdown)
+        )
+        if config.telegram_api_url:
+            # Локальный Bot API сервер или тестовая заглушка
+            api_url = config.telegram_api_url.rstrip('/')
+            builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+        if request:
+            builder = builder.request(request)
+        else:
+            builder = builder.request(build_request(config)).get_updates_request(build_request(config, get_updates=True))
+        self.application = builder.build()
+    
+    def start(self):
+        """Фоновые задачи бота после инициализации приложения"""
+        if self.config.archive_after_days > 0:
+            # Бесконечный цикл: через application.create_task остановка ждала бы его завершения
+            self._archive_task = asyncio.get_running_loop().create_task(self._archive_loop())
+    
+    async def stop(self):
+        """Остановить фоновые задачи и закрыть хранилища"""
+        if self._archive_task:
+            self._archive_task.cancel()
+            try:
+                await self._archive_task
+            except asyncio.CancelledError:
+                pass
+            self._archive_task = None
+        
+        self.analytics_service.close()
+    
+    async def track_activity(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Отметить активность отправителя обновления (без записи в базу)"""
+        if update.effective_user:
+            self.user_service.touch(update.effective_user.id)
+    
+    async def _archive_loop(self):
+        """Периодически переносить неактивных пользователей в холодный архив"""
+        interval = max(60.0, self.config.archive_interval_hours * 3600)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Выполняется в потоке loop, как и остальные операции с базой: запись
+                # из другого потока могла бы потерять параллельные изменения
+                self.user_service.archive_inactive(self.config.archive_after_days)
+            except Exception as e:
+                logger.error(f"❌ Ошибка архивации пользователей: {e}")
+
+
+class TarotBot:
+    """Основной класс Tarot Fortune Bot.
+    
+    Один процесс обслуживает все токены из BOT_TOKENS: у каждого бота свой Application
+    и свои данные (см. Config.for_bot), а колода, AI клиент с кэшем толкований, рендеринг,
+    лимиты и метрики общие. Поэтому память растёт медленнее числа ботов; AI запросы
+    экономятся между ботами только для толкований без имени (DETERMINISTIC_DRAW, карты чатов).
+    """
+    
+    def __init__(self, config: Config, request: Optional[BaseRequest] = None,
+                 ai_service: Optional[AIService] = None):
+        """Инициализация бота. request и ai_service подменяются в нагрузочных тестах."""
+        self.config = config
+        TRACER.configure(config.trace_sample_rate, config.trace_slow_ms, config.trace_file)
+        
+        # Общие для всех ботов сервисы
+        self.ai_service = ai_service or AIService(config)
+        self.render_service = self._create_render_service()
+        self.metrics_server = None
+        if config.metrics_port:
+            self.metrics_server = MetricsServer(config.metrics_host, config.metrics_port)
+        self.loop_monitor = LoopMonitor(config.loop_stall_ms) if config.loop_stall_ms > 0 else None
+        # Профилировщик общий: cProfile и tracemalloc действуют на весь интерпретатор
+        self.profiler = Profiler()
+        
+        # По одному экземпляру на токен; первый - основной (его данные лежат на прежнем месте)
+        self.bots = [BotInstance(self, config.for_bot(token), request) for token in config.bot_tokens]
+        self._bots_by_app = {id(instance.application): instance for instance in self.bots}
+        primary = self.bots[0]
+        self.application = primary.application
+        self.user_service = primary.user_service
+        self.analytics_service = primary.analytics_service
+        self.fortune_service = primary.fortune_service
+        self.spread_service = primary.spread_service
+        self.image_service = primary.image_service
         
         # Инициализация обработчиков
         self._setup_handlers()
         
-        logger.info("🤖 TarotBot инициализирован")
+        logger.info("🤖 TarotBot инициализирован (ботов: %d, транспорт: %s)", len(self.bots), describe_transport(config))
+    
+    def _create_render_service(self):
+        """Создать сервис рендеринга, если он включён и установлен Pillow"""
+        if not self.config.render_images:
+            return None
+
+        render_service = RenderService(self.config, shared_deck())
+        if not render_service.available:
+            logger.warning("⚠️ RENDER_IMAGES включён, но Pillow не установлен")
+            return None
+        return render_service
+    
+    async def _post_init(self, application: Application):
+        """Фоновые задачи после инициализации приложения"""
+        self._bots_by_app[id(application)].start()
+        if application is not self.application:
+            return
+        
+        # Общие ресурсы запускаются один раз - вместе с основным ботом
+        if self.config.fast_start:
+            # openai импортируется в фоне; первый AI запрос дождётся этой загрузки
+            application.create_task(self.ai_service.warm_up())
+        
+        if self.metrics_server:
+            watch_event_loop(asyncio.get_running_loop())
+            await self.metrics_server.start()
+        
+        if self.loop_monitor:
+            self.loop_monitor.start(asyncio.get_running_loop())
+        
+        if self.render_service:
+            # Базовые слои рендерятся в фоне, не задерживая приём обновлений
+            application.create_task(self.render_service.start())
+    
+    async def _post_shutdown(self, application: Application):
+        """Освобождение ресурсов после остановки приложения"""
+        await self._bots_by_app[id(application)].stop()
+        if application is not self.application:
+            return
+        
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+        
+        if self.render_service:
+            await self.render_service.shutdown()
+        
+        # Поток экспорта дописывает очередь трасс; ждать его в потоке loop не нужно
+        await asyncio.to_thread(TRACER.close)
     
     def _setup_handlers(self):
         """Настройка обработчиков команд"""
-        # Создание экземпляров обработчиков
-        basic_handlers = BasicHandlers(self.config, self.user_service)
-        fortune_handlers = FortuneHandlers(self.config, self.fortune_service)
-        stats_handlers = StatsHandlers(self.config, self.user_service)
-        ai_handlers = AIHandlers(self.config, self.ai_service, self.user_service)
-        admin_handlers = AdminHandlers(self.config, self.user_service)
+        # Обработчики без состояния бота общие: лимиты считаются по пользователю во всех ботах
         message_handlers = MessageHandlers(self.config)
+        inline_handlers = InlineHandlers(self.config, self.fortune_service)
+        throttle_handlers = ThrottleHandlers(self.config)
+        
+        for instance in self.bots:
+            self._setup_bot_handlers(instance, message_handlers, inline_handlers, throttle_handlers)
+        
+        logger.info("📋 Обработчики команд настроены")
+    
+    def _setup_bot_handlers(self, instance: BotInstance, message_handlers: MessageHandlers,
+                            inline_handlers: InlineHandlers, throttle_handlers: ThrottleHandlers):
+        """Обработчики одного бота"""
+        config = instance.config
+        application = instance.application
+        
+        # Создание экземпляров обработчиков
+        basic_handlers = BasicHandlers(config, instance.user_service)
+        fortune_handlers = FortuneHandlers(
+            config, instance.fortune_service, instance.image_service, instance.group_service
+        )
+        spread_handlers = SpreadHandlers(config, instance.spread_service)
+        stats_handlers = StatsHandlers(config, instance.user_service)
+        ai_handlers = AIHandlers(config, self.ai_service, instance.user_service)
+        admin_handlers = AdminHandlers(config, instance.user_service, instance.analytics_service, self.profiler)
+        
+        # Активность для холодного архива: любое обновление (команды, inline, текст), до ограничения частоты
+        application.add_handler(TypeHandler(Update, instance.track_activity), group=-2)
+        # Ограничение частоты: группа -1 выполняется до всех команд и может остановить обработку
+        application.add_handler(TypeHandler(Update, throttle_handlers.check), group=-1)
         
         # Регистрация основных команд
-        self.application.add_handler(CommandHandler("start", basic_handlers.start))
-        self.application.add_handler(CommandHandler("help", basic_handlers.help))
+        self._add_command(application, "start", basic_handlers.start)
+        self._add_command(application, "help", basic_handlers.help)
         
         # Команды предсказаний
-        self.application.add_handler(CommandHandler("fortune", fortune_handlers.fortune))
-        self.application.add_handler(CommandHandler("card", fortune_handlers.fortune))
+        self._add_command(application, "fortune", fortune_handlers.fortune)
+        self._add_command(application, "card", fortune_handlers.fortune)
+        self._add_command(application, "spread", spread_handlers.spread)
         
         # Статистика и информация
-        self.application.add_handler(CommandHandler("stats", stats_handlers.stats))
-        self.application.add_handler(CommandHandler("deck", stats_handlers.deck_info))
+        self._add_command(application, "stats", stats_handlers.stats)
+        self._add_command(application, "top", stats_handlers.top)
+        self._add_command(application, "deck", stats_handlers.deck_info)
         
         # AI команды
-        self.application.add_handler(CommandHandler("ai", ai_handlers.toggle))
-        self.application.add_handler(CommandHandler("status", ai_handlers.status))
+        self._add_command(application, "ai", ai_handlers.toggle)
+        self._add_command(application, "status", ai_handlers.status)
         
         # Админские команды
-        self.application.add_handler(CommandHandler("reset", admin_handlers.reset))
-        self.application.add_handler(CommandHandler("adminstats", admin_handlers.admin_stats))
+        self._add_command(application, "reset", admin_handlers.reset)
+        self._add_command(application, "adminstats", admin_handlers.admin_stats)
+        self._add_command(application, "profile", admin_handlers.profile)
+        self._add_command(application, "archive", admin_handlers.archive)
         
-        # Обработчик текстовых сообщений
-        self.application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, message_handlers.handle_text)
+        # Inline режим: поиск карт
+        application.add_handler(
+            InlineQueryHandler(self._instrument("inline", inline_handlers.inline_query))
         )
         
-        logger.info("📋 Обработчики команд настроены")
+        # Обработчик текстовых сообщений
+        application.add_handler(
+            MessageHandler(filters.TEXT & ~filters.COMMAND, self._instrument("text", message_handlers.handle_text))
+        )
+    
+    def _add_command(self, application: Application, command: str, callback):
+        """Зарегистрировать команду с метриками и трассировкой"""
+        application.add_handler(CommandHandler(command, self._instrument(command, callback)))
+    
+    @staticmethod
+    def _instrument(name: str, callback):
+        """Обернуть обработчик: замер времени и корневой span обновления"""
+        return instrument_handler(name, trace_handler(name, callback))
     
     def run(self):
         """Запуск бота"""
@@ -85,8 +288,11 @@ class TarotBot:
         self._print_startup_info()
         
         try:
-            # Запуск polling
-            self.application.run_polling(allowed_updates=['message', 'callback_query'])
+            if len(self.bots) == 1:
+                # Запуск polling
+                self.application.run_polling(allowed_updates=ALLOWED_UPDATES)
+            else:
+                asyncio.run(self._run_all())
         except KeyboardInterrupt:
             logger.info("👋 Получен сигнал завершения")
         except Exception as e:
@@ -95,6 +301,37 @@ class TarotBot:
         finally:
             logger.info("🔮 Бот завершил работу")
     
+    async def _run_all(self):
+        """Polling всех ботов в одном event loop (то, что run_polling делает для одного приложения)"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: остановка по KeyboardInterrupt
+        
+        started = []
+        try:
+            for instance in self.bots:
+                application = instance.application
+                await application.initialize()
+                started.append(application)
+                await application.post_init(application)
+                await application.updater.start_polling(allowed_updates=ALLOWED_UPDATES)
+                await application.start()
+                logger.info("🤖 Бот @%s запущен", application.bot.username)
+            await stop.wait()
+        finally:
+            # Основной бот останавливается последним: вместе с ним освобождаются общие ресурсы
+            for application in reversed(started):
+                if application.updater.running:
+                    await application.updater.stop()
+                if application.running:
+                    await application.stop()
+                await application.shutdown()
+                await application.post_shutdown(application)
+    
     def _print_startup_info(self):
         """Вывод информации при запуске"""
         card_stats = get_cards_by_type()
@@ -108,4 +345,6 @@ class TarotBot:
         print(f"🎴 Колода содержит: {card_stats['total']} карт ({card_stats['major_arcana']} старших + {card_stats['minor_arcana']} младших)")
         print(f"🤖 AI толкования (Groq): {ai_status}")
         print(f"👑 Админ доступ: {admin_status}")
+        if len(self.bots) > 1:
+            print(f"🤝 Ботов в процессе: {len(self.bots)} (общие колода, AI и кэш толкований)")
         print("Используйте Ctrl+C чтобы остановить бота")
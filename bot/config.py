@@ -3,6 +3,7 @@
 Конфигурация бота
 """
 
+import copy
 import os
 from dotenv import load_dotenv
 from typing import Optional, List
@@ -10,19 +11,66 @@ from typing import Optional, List
 # Загрузить переменные окружения
 load_dotenv()
 
+def _get_bool(name: str, default: bool = False) -> bool:
+    """Прочитать флаг из переменной окружения"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _get_float(name: str, default: float) -> float:
+    """Прочитать дробное число из переменной окружения"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+def _get_int(name: str, default: int) -> int:
+    """Прочитать целое число из переменной окружения"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
 class Config:
     """Класс конфигурации бота"""
     
     def __init__(self):
         """Инициализация конфигурации"""
         # Загрузить обязательные переменные
-        self.bot_token = os.getenv('BOT_TOKEN')
+        # BOT_TOKENS - несколько ботов в одном процессе через запятую; первый считается основным
+        # Повторы убираются с сохранением порядка: два опроса одного токена конфликтуют в getUpdates
+        self.bot_tokens = list(dict.fromkeys(
+            token.strip() for token in os.getenv('BOT_TOKENS', '').split(',') if token.strip()
+        ))
+        self.bot_token = os.getenv('BOT_TOKEN') or next(iter(self.bot_tokens), None)
         if not self.bot_token:
             raise ValueError("BOT_TOKEN не найден! Убедитесь, что он указан в .env файле")
+        if self.bot_token not in self.bot_tokens:
+            self.bot_tokens.insert(0, self.bot_token)
         
         # Загрузить опциональные переменные
         self.groq_api_key = os.getenv('GROQ_API_KEY')
         
+        # Адрес Bot API (например, локальный telegram-bot-api сервер)
+        self.telegram_api_url = os.getenv('TELEGRAM_API_URL')
+        
+        # Транспорт Bot API: пул соединений для отправки сообщений (getUpdates использует свой),
+        # время жизни простаивающих соединений, HTTP/2 (нужен пакет h2) и таймауты в секундах
+        self.telegram_pool_size = _get_int('TELEGRAM_POOL_SIZE', 256)
+        self.telegram_keepalive = _get_float('TELEGRAM_KEEPALIVE', 30.0)
+        self.telegram_http2 = _get_bool('TELEGRAM_HTTP2')
+        self.telegram_connect_timeout = _get_float('TELEGRAM_CONNECT_TIMEOUT', 5.0)
+        self.telegram_read_timeout = _get_float('TELEGRAM_READ_TIMEOUT', 5.0)
+        self.telegram_write_timeout = _get_float('TELEGRAM_WRITE_TIMEOUT', 5.0)
+        self.telegram_pool_timeout = _get_float('TELEGRAM_POOL_TIMEOUT', 1.0)
+        
         admin_id_str = os.getenv('ADMIN_ID')
         self.admin_id = None
         if admin_id_str:
@@ -35,11 +83,109 @@ class Config:
         self.data_dir = os.path.join('bot', 'data', 'users')
         self.user_data_file = os.path.join(self.data_dir, 'users_data.json')
         
+        # Формат файла базы: json (с отступами), compact, fast (orjson/msgspec, если установлены),
+        # binary (msgpack). Файл в другом формате переводится в выбранный при запуске
+        self.storage_format = os.getenv('STORAGE_FORMAT', 'json')
+        
+        # Сколько пользователей держать в памяти (identity map в UserService)
+        self.user_cache_size = _get_int('USER_CACHE_SIZE', 10000)
+        
+        # Холодный архив: пользователи без активности дольше ARCHIVE_AFTER_DAYS дней выносятся
+        # из основной базы в сжатые сегменты (0 - фоновая архивация выключена)
+        self.cold_storage_dir = os.path.join(self.data_dir, 'cold')
+        self.archive_after_days = _get_int('ARCHIVE_AFTER_DAYS', 180)
+        self.archive_interval_hours = _get_float('ARCHIVE_INTERVAL_HOURS', 24.0)
+        
+        # Таблицы лидеров (/top): сколько мест хранить в каждой таблице
+        self.leaderboard_file = os.path.join(self.data_dir, 'leaderboard.json')
+        self.leaderboard_size = _get_int('LEADERBOARD_SIZE', 10)
+        
+        # Групповые чаты: одна общая карта дня на чат вместо предсказания каждому участнику
+        self.group_daily_card = _get_bool('GROUP_DAILY_CARD', True)
+        self.group_cards_file = os.path.join(self.data_dir, 'group_cards.json')
+        
+        # Историческая аналитика: дневные сводки предсказаний
+        self.analytics_file = os.path.join(self.data_dir, 'analytics.bin')
+        
         # Приоритет моделей Groq
         self.groq_models = [
             'llama-3.3-70b-versatile',
             'llama-3.1-8b-instant',
         ]
+        
+        # Таймаут запроса к одной модели Groq (секунды); после него пробуется следующая модель
+        self.ai_timeout = _get_float('AI_TIMEOUT', 15.0)
+        # Бюджет ожидания AI в /fortune: если толкование не готово за AI_DEADLINE секунд,
+        # сразу отправляется классическое, а AI версия заменяет его, когда придёт (0 - ждать AI)
+        self.ai_deadline = _get_float('AI_DEADLINE', 0.0)
+        
+        # Детерминированный расклад: карта и шаблон дня выводятся из HMAC(user_id, дата, секрет),
+        # поэтому повторный /fortune показывает ту же карту без хранения текста
+        self.deterministic_draw = _get_bool('DETERMINISTIC_DRAW')
+        self.draw_secret = os.getenv('DRAW_SECRET') or self.bot_token
+        # Сколько AI толкований держать в памяти (ключ: карта, имя, день)
+        self.interpretation_cache_size = _get_int('INTERPRETATION_CACHE_SIZE', 512)
+        
+        # Расклады: могут ли карты выпадать в перевёрнутом положении
+        self.spread_reversals = _get_bool('SPREAD_REVERSALS', True)
+        
+        # Ограничение частоты: общий лимит на пользователя и отдельный на каждую команду
+        # (токенов в секунду и размер запаса); 0 в THROTTLE_RATE отключает ограничение
+        self.throttle_rate = _get_float('THROTTLE_RATE', 1.0)
+        self.throttle_burst = _get_int('THROTTLE_BURST', 8)
+        self.throttle_command_rate = _get_float('THROTTLE_COMMAND_RATE', 0.2)
+        self.throttle_command_burst = _get_int('THROTTLE_COMMAND_BURST', 3)
+        
+        # Быстрый старт: openai и AI клиент загружаются в фоне после запуска
+        self.fast_start = _get_bool('FAST_START')
+        
+        # Inline режим: сколько секунд Telegram может кэшировать ответы
+        self.inline_cache_time = _get_int('INLINE_CACHE_TIME', 86400)
+        
+        # Изображения карт: bot/data/cards/<номер карты>.jpg|.png|.webp
+        self.card_images_enabled = _get_bool('CARD_IMAGES')
+        self.card_images_dir = os.path.join('bot', 'data', 'cards')
+        self.file_id_index_file = os.path.join(self.data_dir, 'card_file_ids.json')
+        
+        # Персональные изображения (имя и дата поверх карты), нужен Pillow
+        self.render_images = _get_bool('RENDER_IMAGES')
+        self.render_workers = _get_int('RENDER_WORKERS', 0)  # 0 - по числу ядер
+        self.render_cache_mb = _get_int('RENDER_CACHE_MB', 256)
+        self.render_cache_dir = os.path.join('bot', 'data', 'rendered')
+        self.render_font = os.getenv('RENDER_FONT')  # путь к TTF шрифту с кириллицей
+        
+        # Метрики Prometheus: 0 - эндпоинт выключен
+        self.metrics_port = _get_int('METRICS_PORT', 0)
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        
+        # Контроль event loop: порог блокировки, после которого в лог пишется стек; 0 - выключен
+        self.loop_stall_ms = _get_int('LOOP_STALL_MS', 250)
+        
+        # Трассировка: доля трасс для экспорта и порог журнала медленных запросов
+        self.trace_sample_rate = _get_float('TRACE_SAMPLE_RATE', 0.0)
+        self.trace_slow_ms = _get_int('TRACE_SLOW_MS', 0)
+        self.trace_file = os.getenv('TRACE_FILE', os.path.join('bot', 'data', 'traces.jsonl'))
+    
+    def for_bot(self, token: str) -> 'Config':
+        """Конфигурация дополнительного бота: свои данные в bot/data/users/bot<id>/.
+        
+        Основной бот (BOT_TOKEN) продолжает пользоваться прежними файлами.
+        """
+        if token == self.bot_token:
+            return self
+        
+        config = copy.copy(self)
+        config.bot_token = token
+        config.bot_tokens = [token]
+        config.data_dir = os.path.join(self.data_dir, f"bot{token.split(':', 1)[0]}")
+        for name in ('user_data_file', 'analytics_file', 'file_id_index_file', 'leaderboard_file',
+                     'group_cards_file'):
+            setattr(config, name, os.path.join(config.data_dir, os.path.basename(getattr(self, name))))
+        config.cold_storage_dir = os.path.join(config.data_dir, os.path.basename(self.cold_storage_dir))
+        if self.draw_secret == self.bot_token:
+            # Без DRAW_SECRET расклады каждого бота выводятся из его собственного токена
+            config.draw_secret = token
+        return config
     
     @property
     def ai_available(self) -> bool:
@@ -1,25 +1,40 @@
 # -*- coding: utf-8 -*-
 """
-Админские обработчики команд (/reset, /adminstats)
+Админские обработчики команд (/reset, /adminstats, /profile, /archive)
 """
 
+import io
 import logging
+from datetime import datetime
+from typing import Optional
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
+from ..utils.formatting import render_message
+from ..utils.profiling import Profiler, parse_duration, MAX_SECONDS
 from ..services.user_service import UserService
-from ..data.tarot_cards import get_total_cards
+from ..services.analytics_service import AnalyticsService
+from ..data.tarot_cards import get_total_cards, tarot_deck
 
 logger = logging.getLogger(__name__)
 
+# Ограничение периода /adminstats range: таблица должна поместиться в одно сообщение
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 90
+
 class AdminHandlers:
     """Обработчики админских команд"""
     
-    def __init__(self, config: Config, user_service: UserService):
+    def __init__(self, config: Config, user_service: UserService,
+                 analytics: Optional[AnalyticsService] = None, profiler: Optional[Profiler] = None):
         """Инициализация обработчиков"""
         self.config = config
         self.user_service = user_service
+        self.analytics = analytics
+        # Один профилировщик на процесс: снимки разных ботов не должны пересекаться
+        self.profiler = profiler or Profiler()
     
     async def reset(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команды /reset - сброс базы данных"""
@@ -47,7 +62,7 @@ class AdminHandlers:
             else:
                 reset_message = f"❌ Ошибка сброса базы данных: {result['message']}"
             
-            await update.message.reply_text(reset_message, parse_mode='Markdown')
+            await update.message.reply_text(render_message(reset_message), parse_mode=ParseMode.HTML)
             logger.warning(f"🔧 Админ {user_id} сбросил базу данных")
             
         except Exception as e:
@@ -63,6 +78,10 @@ class AdminHandlers:
             await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
             return
         
+        if context.args and context.args[0] == 'range':
+            await self._admin_stats_range(update, context.args[1:])
+            return
+        
         try:
             # Получить статистику
             stats = self.user_service.get_all_stats()
@@ -72,7 +91,7 @@ class AdminHandlers:
 📊 **Статистика бота:**
 
 👥 **Пользователи:**
-• Всего пользователей: {stats['total_users']}
+• Всего пользователей: {stats['total_users']} (в архиве: {stats['archived_users']})
 • Активных сегодня: {stats['users_today']}
 • Всего предсказаний: {stats['total_fortunes']}
 
@@ -89,13 +108,149 @@ class AdminHandlers:
 ⚙️ **Админ команды:**
 /reset - сбросить базу данных
 /adminstats - эта статистика
+/adminstats range 30 - динамика за 30 дней
+/profile cpu 30s - профиль CPU, /profile mem 30s - выделения памяти
+/archive 180 - перенести в архив неактивных дольше 180 дней
 
 👑 Админ ID: {self.config.admin_id}
             """
             
-            await update.message.reply_text(stats_message, parse_mode='Markdown')
-            logger.info(f"📊 Админ {user_id} запросил статистику")
+            await update.message.reply_text(render_message(stats_message), parse_mode=ParseMode.HTML)
+            logger.info("📊 Админ %s запросил статистику", user_id, extra={'user_id': user_id, 'command': 'adminstats'})
             
         except Exception as e:
             await update.message.reply_text(f"❌ Ошибка получения статистики: {e}")
             logger.error(f"❌ Ошибка статистики для админа {user_id}: {e}")
+
+    async def _admin_stats_range(self, update: Update, args: list) -> None:
+        """Обработчик /adminstats range N - дневные сводки за последние N дней"""
+        if not self.analytics:
+            await update.message.reply_text("❌ Аналитика не настроена.")
+            return
+        
+        try:
+            days = int(args[0]) if args else DEFAULT_RANGE_DAYS
+        except ValueError:
+            await update.message.reply_text("❌ Использование: /adminstats range 30")
+            return
+        days = max(1, min(days, MAX_RANGE_DAYS))
+        
+        history = self.analytics.get_range(days)
+        fortunes = sum(day.fortunes for day in history)
+        ai = sum(day.ai for day in history)
+        new_users = sum(day.new for day in history)
+        average_dau = sum(day.active for day in history) / len(history)
+        
+        lines = ["дата   DAU  нов  AI%"]
+        for day in history:
+            ai_share = f"{day.ai * 100 // day.fortunes}%" if day.fortunes else "-"
+            lines.append(f"{day.day:%d.%m} {day.active:>5} {day.new:>4} {ai_share:>4}")
+        
+        card_totals = [sum(counts) for counts in zip(*(day.cards for day in history))]
+        top_cards = sorted(
+            (card_id for card_id, count in enumerate(card_totals) if count),
+            key=lambda card_id: card_totals[card_id],
+            reverse=True
+        )[:5]
+        
+        summary = [
+            "",
+            f"📊 Средний DAU: {average_dau:.1f}",
+            f"👤 Новых пользователей: {new_users}",
+            f"🔮 Предсказаний: {fortunes} (AI: {ai * 100 // fortunes if fortunes else 0}%)",
+            f"🔁 Повторных запросов: {sum(day.repeats for day in history)}",
+        ]
+        if top_cards:
+            summary.append("🎴 Чаще всего: " + ", ".join(
+                f"{tarot_deck[card_id]['name']} ({card_totals[card_id]})" for card_id in top_cards
+            ))
+        
+        # Таблица - в моноширинном блоке, чтобы столбцы были выровнены
+        await update.message.reply_text(
+            render_message(f"📈 **Динамика за {days} дн.**\n```\n" + "\n".join(lines) + "\n```" + "\n".join(summary)),
+            parse_mode=ParseMode.HTML
+        )
+        logger.info("📈 Админ %s запросил динамику за %d дн.", update.effective_user.id,
+                    days, extra={'user_id': update.effective_user.id, 'command': 'adminstats'})
+
+    async def profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик команды /profile cpu|mem [длительность] - снимок профиля работающего бота"""
+        user_id = update.effective_user.id
+        
+        if not self.user_service.is_admin(user_id):
+            await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+            return
+        
+        kind = context.args[0].lower() if context.args else None
+        seconds = parse_duration(context.args[1] if len(context.args or ()) > 1 else None)
+        if kind not in ('cpu', 'mem') or seconds is None:
+            await update.message.reply_text(
+                f"❌ Использование: /profile cpu 30s или /profile mem 2m (не больше {MAX_SECONDS} с)"
+            )
+            return
+        
+        # Резерв берётся до первого await: вторая команда, пришедшая до старта задачи, получит отказ
+        if not self.profiler.try_acquire():
+            await update.message.reply_text("⏳ Профилирование уже выполняется, дождитесь результата.")
+            return
+        
+        # Снимок идёт в фоне: обработка остальных обновлений не должна ждать его окончания
+        try:
+            await update.message.reply_text(f"🔬 Профилирование {kind} запущено на {seconds} с...")
+            context.application.create_task(self._run_profile(update, kind, seconds))
+        except Exception:
+            self.profiler.release()
+            raise
+        logger.warning("🔬 Админ %s запустил профилирование %s на %d с", user_id, kind, seconds,
+                       extra={'user_id': user_id, 'command': 'profile'})
+    
+    async def _run_profile(self, update: Update, kind: str, seconds: int) -> None:
+        """Выполнить снимок и отправить отчёт файлом"""
+        try:
+            if kind == 'cpu':
+                report = await self.profiler.capture_cpu(seconds)
+            else:
+                report = await self.profiler.capture_memory(seconds)
+            
+            filename = f"profile-{kind}-{datetime.now():%Y%m%d_%H%M%S}.txt"
+            await update.message.reply_document(
+                document=io.BytesIO(report.encode('utf-8')),
+                filename=filename,
+                caption=f"🔬 Профиль {kind} за {seconds} с"
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка профилирования {kind}: {e}")
+            await update.message.reply_text(f"❌ Ошибка профилирования: {e}")
+        finally:
+            self.profiler.release()
+    
+    async def archive(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик команды /archive [дней] - перенести неактивных пользователей в холодный архив"""
+        user_id = update.effective_user.id
+        
+        if not self.user_service.is_admin(user_id):
+            await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+            return
+        
+        days = self.config.archive_after_days
+        if context.args:
+            try:
+                days = int(context.args[0])
+            except ValueError:
+                days = 0
+        if days <= 0:
+            await update.message.reply_text("❌ Использование: /archive 180 (дней без активности)")
+            return
+        
+        try:
+            result = self.user_service.archive_inactive(days)
+            cold_users, segments, size = self.user_service.cold.get_stats()
+            await update.message.reply_text(
+                f"🧊 Перенесено в архив: {result['archived']}\n"
+                f"🔥 В основной базе: {result['hot_users']}\n"
+                f"📦 В архиве: {cold_users} ({segments} сегм., {size / 1024:.0f} КБ)"
+            )
+            logger.warning(f"🧊 Админ {user_id} запустил архивацию: {result['archived']} пользователей")
+        except Exception as e:
+            await update.message.reply_text(f"❌ Ошибка архивации: {e}")
+            logger.error(f"❌ Ошибка архивации админом {user_id}: {e}")
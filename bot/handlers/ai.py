@@ -5,9 +5,11 @@
 
 import logging
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
+from ..utils.formatting import render_message
 from ..services.ai_service import AIService
 from ..services.user_service import UserService
 
@@ -52,8 +54,8 @@ class AIHandlers:
 💡 Используйте /ai чтобы снова переключить режим.
             """
 
-            await update.message.reply_text(toggle_message, parse_mode='Markdown')
-            logger.info(f"🔄 Пользователь {user.id} переключил AI: {status}")
+            await update.message.reply_text(render_message(toggle_message), parse_mode=ParseMode.HTML)
+            logger.info("🔄 Пользователь %s переключил AI: %s", user.id, status, extra={'user_id': user.id, 'command': 'ai'})
 
         except Exception as e:
             logger.error(f"❌ Ошибка переключения AI для {user.id}: {e}")
@@ -91,8 +93,8 @@ class AIHandlers:
 💡 Используйте /ai чтобы переключить режим
                 """
 
-            await update.message.reply_text(status_message, parse_mode='Markdown')
-            logger.info(f"🔍 Пользователь {user_id} проверил статус AI")
+            await update.message.reply_text(render_message(status_message), parse_mode=ParseMode.HTML)
+            logger.info("🔍 Пользователь %s проверил статус AI", user_id, extra={'user_id': user_id, 'command': 'status'})
 
         except Exception as e:
             logger.error(f"❌ Ошибка проверки статуса AI для {user_id}: {e}")
@@ -5,9 +5,11 @@
 
 import logging
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
+from ..utils.formatting import escape_markdown, render_message
 from ..services.user_service import UserService
 from ..data.tarot_cards import get_cards_by_type
 
@@ -24,7 +26,7 @@ class BasicHandlers:
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команды /start"""
         user = update.effective_user
-        user_name = user.first_name or "друг"
+        user_name = escape_markdown(user.first_name or "друг")
         
         # Регистрация/обновление пользователя
         self.user_service.get_user(user.id, user.first_name)
@@ -46,7 +48,9 @@ class BasicHandlers:
 **Команды:**
 /fortune - Получить своё ежедневное предсказание
 /card - То же, что и /fortune
+/spread - Расклад из трёх карт или Кельтский крест
 /stats - Посмотреть вашу статистику
+/top - Таблицы лидеров
 /deck - Информация о колоде
 /ai - Переключить режим толкований
 /help - Показать справку
@@ -57,8 +61,8 @@ class BasicHandlers:
 💫 Помните: карты дают мудрость лишь раз в день.
         """
         
-        await update.message.reply_text(welcome_message)
-        logger.info(f"👋 Пользователь {user.id} выполнил /start")
+        await update.message.reply_text(render_message(welcome_message), parse_mode=ParseMode.HTML)
+        logger.info("👋 Пользователь %s выполнил /start", user.id, extra={'user_id': user.id, 'command': 'start'})
     
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команды /help"""
@@ -72,7 +76,9 @@ class BasicHandlers:
 **Основные команды:**
 /fortune - Получить ежедневное предсказание Таро
 /card - То же, что и /fortune
+/spread - Расклад: три карты или /spread кельтский
 /stats - Посмотреть вашу статистику  
+/top - Таблицы лидеров и серии
 /deck - Информация о колоде карт
 
 **AI и настройки:**
@@ -95,5 +101,8 @@ class BasicHandlers:
 💫 Пусть карты направляют ваш путь!
         """
         
-        await update.message.reply_text(help_message, parse_mode='Markdown')
-        logger.info(f"❓ Пользователь {update.effective_user.id} запросил помощь")
+        await update.message.reply_text(render_message(help_message), parse_mode=ParseMode.HTML)
+        logger.info(
+            "❓ Пользователь %s запросил помощь", update.effective_user.id,
+            extra={'user_id': update.effective_user.id, 'command': 'help'}
+        )
@@ -4,12 +4,18 @@
 """
 
 import logging
-from telegram import Update
-from telegram.error import BadRequest
+from typing import Optional
+from telegram import ReplyParameters, Update
+from telegram.constants import ChatType, ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
 from ..services.fortune_service import FortuneService
+from ..services.group_service import GroupFortuneService
+from ..services.image_service import ImageService
+from ..models.card import TarotCard
+from ..utils.formatting import escape_markdown, render_message
+from ..utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -23,41 +29,61 @@ ERROR_MESSAGE = (
 class FortuneHandlers:
     """Обработчики команд предсказаний"""
 
-    def __init__(self, config: Config, fortune_service: FortuneService):
+    def __init__(self, config: Config, fortune_service: FortuneService, image_service: Optional[ImageService] = None,
+                 group_service: Optional[GroupFortuneService] = None):
         """Инициализация обработчиков"""
         self.config = config
         self.fortune_service = fortune_service
+        self.image_service = image_service
+        self.group_service = group_service
 
     async def fortune(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команд /fortune и /card"""
         user = update.effective_user
-        user_name = user.first_name or "друг"
+        user_name = escape_markdown(user.first_name or "друг")
         placeholder = None
 
+        chat = update.effective_chat
+        if self.group_service and chat and chat.type in (ChatType.GROUP, ChatType.SUPERGROUP):
+            await self._group_fortune(update, context, user_name)
+            return
+
         try:
             # Отправить placeholder пока генерируется предсказание
-            placeholder = await update.message.reply_text("🔮 Тасую карты и раскладываю расклад...")
+            with span('telegram.reply_text'):
+                placeholder = await update.message.reply_text("🔮 Тасую карты и раскладываю расклад...")
 
             # Получить предсказание
             result = await self.fortune_service.get_daily_fortune(user.id, user.first_name)
 
-            # Форматировать и заменить placeholder ответом
-            response_message = self.fortune_service.format_fortune_response(user_name, result)
+            # Форматировать и заменить placeholder ответом. Разметка проверяется локально,
+            # поэтому ответ - ровно один вызов edit_text
+            response_message = render_message(self.fortune_service.format_fortune_response(user_name, result))
+            with span('telegram.edit_text'):
+                await placeholder.edit_text(response_message, parse_mode=ParseMode.HTML)
+
+            # AI толкование не уложилось в AI_DEADLINE: заменить ответ, когда оно придёт,
+            # не задерживая обработку следующих обновлений
+            if result.get('ai_task'):
+                context.application.create_task(self._upgrade(placeholder, user.id, user_name, result))
 
-            # Попробовать с Markdown; если AI вернул сломанный Markdown — отправить plain text
-            try:
-                await placeholder.edit_text(response_message, parse_mode='Markdown')
-            except BadRequest:
-                logger.warning(f"⚠️ Markdown parse failed for user {user.id}, falling back to plain text")
-                await placeholder.edit_text(response_message)
+            # Изображение карты (если включено и есть файл); при повторном показе - та же карта
+            if result.get('card') and self.image_service:
+                with span('telegram.send_photo'):
+                    await self._send_card_image(update, context, result['card'], user.first_name)
 
             # Логирование
             if result['success']:
-                card_name = result['card'].name
-                ai_used = "AI" if result['ai_used'] else "классическое"
-                logger.info(f"🔮 Пользователь {user.id} получил предсказание: {card_name} ({ai_used})")
+                logger.info(
+                    "🔮 Пользователь %s получил предсказание: %s (%s)",
+                    user.id, result['card'].name, "AI" if result['ai_used'] else "классическое",
+                    extra={'user_id': user.id, 'command': 'fortune'}
+                )
             else:
-                logger.info(f"⏳ Пользователь {user.id} уже получал предсказание сегодня")
+                logger.info(
+                    "⏳ Пользователь %s уже получал предсказание сегодня (%s)", user.id, result['type'],
+                    extra={'user_id': user.id, 'command': 'fortune'}
+                )
 
         except Exception as e:
             logger.error(f"❌ Ошибка обработки предсказания для {user.id}: {e}")
@@ -70,3 +96,111 @@ class FortuneHandlers:
                 except Exception:
                     pass
             await update.message.reply_text(ERROR_MESSAGE)
+
+    async def _group_fortune(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_name: str) -> None:
+        """/fortune в группе: одна карта дня на чат, каждому участнику - не больше одного ответа в день"""
+        user = update.effective_user
+        chat = update.effective_chat
+        group_service = self.group_service
+
+        claimed = False
+        try:
+            entry = await group_service.get_daily_card(chat.id)
+
+            # Повторный /fortune участника в тот же день остаётся без ответа, чтобы не засорять чат
+            if not group_service.user_service.claim_daily(user.id, chat.id):
+                logger.info(
+                    "⏳ Пользователь %s уже получал карту чата %s сегодня", user.id, chat.id,
+                    extra={'user_id': user.id, 'command': 'fortune'}
+                )
+                return
+            claimed = True
+
+            if group_service.claim_post(chat.id):
+                try:
+                    title = escape_markdown(chat.title or "этого чата")
+                    with span('telegram.reply_text'):
+                        message = await update.message.reply_text(
+                            render_message(group_service.format_card(entry, title)), parse_mode=ParseMode.HTML
+                        )
+                except Exception:
+                    group_service.release_post(chat.id)
+                    raise
+                group_service.remember_message(chat.id, message.message_id)
+                # AI толкование не уложилось в AI_DEADLINE: карта обновится, когда оно придёт
+                upgrade = group_service.pending_upgrade(chat.id)
+                if upgrade:
+                    context.application.create_task(self._group_upgrade(message, chat.id, title, upgrade))
+                if self.image_service:
+                    # Карта общая для чата: изображение без имени участника, который её вызвал
+                    with span('telegram.send_photo'):
+                        await self._send_card_image(update, context, group_service.card_of(entry))
+            else:
+                # Карта уже в чате: короткий ответ со ссылкой на сообщение с ней
+                reply_parameters = None
+                if entry.get('message_id'):
+                    reply_parameters = ReplyParameters(entry['message_id'], allow_sending_without_reply=True)
+                with span('telegram.reply_text'):
+                    await update.message.reply_text(
+                        render_message(group_service.format_reminder(entry, user_name)),
+                        parse_mode=ParseMode.HTML, reply_parameters=reply_parameters
+                    )
+
+            logger.info(
+                "👥 Пользователь %s получил карту дня чата %s", user.id, chat.id,
+                extra={'user_id': user.id, 'command': 'fortune'}
+            )
+
+        except Exception as e:
+            logger.error(
+                "❌ Ошибка карты дня чата %s для %s: %s", chat.id, user.id, e,
+                extra={'user_id': user.id, 'command': 'fortune'}
+            )
+            if claimed:
+                # Участник не получил ответа: повторный /fortune не должен молча игнорироваться
+                group_service.user_service.release_daily(user.id, chat.id)
+            await update.message.reply_text(ERROR_MESSAGE)
+
+    async def _group_upgrade(self, message, chat_id: int, title: str, upgrade) -> None:
+        """Заменить опубликованную карту чата AI версией (или убрать обещание AI)"""
+        try:
+            upgraded = await upgrade
+            entry = self.group_service.get_cached_card(chat_id)
+            if entry is None:
+                return
+            with span('telegram.edit_text'):
+                await message.edit_text(
+                    render_message(self.group_service.format_card(entry, title)), parse_mode=ParseMode.HTML
+                )
+            logger.info(
+                "🤖 Карта дня чата %s %s", chat_id,
+                "обновлена AI толкованием" if upgraded else "осталась классической"
+            )
+        except Exception as e:
+            logger.warning("⚠️ Не удалось обновить карту дня чата %s AI толкованием: %s", chat_id, e)
+
+    async def _upgrade(self, message, user_id: int, user_name: str, result: dict) -> None:
+        """Заменить классическое предсказание AI версией (или убрать обещание AI, если она не пришла)"""
+        try:
+            upgraded = await self.fortune_service.upgrade_fortune(user_id, result)
+            final = upgraded or dict(result, ai_task=None)
+            with span('telegram.edit_text'):
+                await message.edit_text(
+                    render_message(self.fortune_service.format_fortune_response(user_name, final)),
+                    parse_mode=ParseMode.HTML
+                )
+            logger.info(
+                "🤖 Предсказание пользователя %s %s", user_id,
+                "обновлено AI толкованием" if upgraded else "осталось классическим",
+                extra={'user_id': user_id, 'command': 'fortune'}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить предсказание {user_id} AI толкованием: {e}")
+
+    async def _send_card_image(self, update: Update, context: ContextTypes.DEFAULT_TYPE, card: TarotCard,
+                               reader_name: Optional[str] = None) -> None:
+        """Отправить изображение карты (с именем reader_name, если задано); ошибка не должна ломать предсказание"""
+        try:
+            await self.image_service.send_card_image(context.bot, update.effective_chat.id, card, reader_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось отправить изображение карты {card.name}: {e}")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Обработчик inline-режима (@bot луна)
+"""
+
+import logging
+from functools import cached_property
+from typing import List
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from ..config import Config
+from ..services.card_index import CardIndex
+from ..services.fortune_service import FortuneService
+from ..utils.formatting import render_message
+
+logger = logging.getLogger(__name__)
+
+
+class InlineHandlers:
+    """Обработчик inline запросов с заранее подготовленными результатами"""
+
+    def __init__(self, config: Config, fortune_service: FortuneService):
+        """Инициализация обработчика. Индекс и результаты строятся при первом запросе."""
+        self.config = config
+        self.fortune_service = fortune_service
+
+    @cached_property
+    def card_index(self) -> CardIndex:
+        """Поисковый индекс колоды"""
+        return CardIndex(self.fortune_service.cards)
+
+    @cached_property
+    def _results(self) -> List[InlineQueryResultArticle]:
+        """Результаты для всех карт. Объекты неизменяемы, поэтому строятся один раз на всю колоду."""
+        return [
+            InlineQueryResultArticle(
+                id=str(card_id),
+                title=str(card),
+                description=card.meaning,
+                input_message_content=InputTextMessageContent(
+                    render_message(f"{card.get_type_emoji()} **{card.name}**\n\n{card.meaning}"),
+                    parse_mode=ParseMode.HTML
+                ),
+            )
+            for card_id, card in enumerate(self.card_index.cards)
+        ]
+
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик inline запроса - поиск карт по названию и значению"""
+        query = update.inline_query.query
+        card_ids = self.card_index.search(query)
+
+        await update.inline_query.answer(
+            [self._results[card_id] for card_id in card_ids],
+            cache_time=self.config.inline_cache_time,
+            is_personal=False,
+        )
+        logger.debug("🔎 Inline запрос '%s': %d карт", query, len(card_ids), extra={'command': 'inline'})
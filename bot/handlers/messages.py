@@ -5,9 +5,11 @@
 
 import logging
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
+from ..utils.formatting import escape_markdown, render_message
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +23,7 @@ class MessageHandlers:
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик обычных текстовых сообщений"""
         user = update.effective_user
-        user_name = user.first_name or "друг"
+        user_name = escape_markdown(user.first_name or "друг")
         message_text = update.message.text
         
         try:
@@ -51,9 +53,12 @@ class MessageHandlers:
 💫 Используйте команды выше для взаимодействия с ботом.
             """
             
-            await update.message.reply_text(help_message, parse_mode='Markdown')
+            await update.message.reply_text(render_message(help_message), parse_mode=ParseMode.HTML)
             
-            logger.info(f"💬 Пользователь {user.id} отправил текстовое сообщение: {message_text[:50]}...")
+            logger.info(
+                "💬 Пользователь %s отправил текстовое сообщение: %.50s...", user.id, message_text,
+                extra={'user_id': user.id, 'command': 'text'}
+            )
             
         except Exception as e:
             logger.error(f"❌ Ошибка обработки сообщения от {user.id}: {e}")
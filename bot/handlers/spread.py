@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Обработчик раскладов (/spread)
+"""
+
+import logging
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from ..config import Config
+from ..services.spread_service import SpreadService
+from ..utils.formatting import escape_markdown, render_message, split_message
+from ..utils.tracing import span
+from .fortune import ERROR_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+USAGE_MESSAGE = (
+    "🃏 Расклады:\n"
+    "/spread - три карты (прошлое, настоящее, будущее)\n"
+    "/spread кельтский - Кельтский крест из 10 карт"
+)
+
+
+class SpreadHandlers:
+    """Обработчики команд раскладов"""
+
+    def __init__(self, config: Config, spread_service: SpreadService):
+        """Инициализация обработчиков"""
+        self.config = config
+        self.spread_service = spread_service
+
+    async def spread(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик команды /spread [три|кельтский]"""
+        user = update.effective_user
+        user_name = escape_markdown(user.first_name or "друг")
+
+        kind = self.spread_service.resolve_kind(context.args[0] if context.args else None)
+        if kind is None:
+            await update.message.reply_text(USAGE_MESSAGE)
+            return
+
+        placeholder = None
+        try:
+            with span('telegram.reply_text'):
+                placeholder = await update.message.reply_text("🃏 Раскладываю карты...")
+
+            spread = await self.spread_service.get_spread(kind, user.id, user.first_name)
+            parts = split_message(self.spread_service.format_spread(user_name, spread))
+
+            # Первая часть заменяет placeholder, остальные отправляются следом
+            with span('telegram.edit_text'):
+                await placeholder.edit_text(render_message(parts[0]), parse_mode=ParseMode.HTML)
+            for part in parts[1:]:
+                with span('telegram.reply_text'):
+                    await update.message.reply_text(render_message(part), parse_mode=ParseMode.HTML)
+
+            logger.info(
+                "🃏 Пользователь %s получил расклад %s (AI позиций: %d из %d)",
+                user.id, kind, spread.ai_positions, len(spread.cards),
+                extra={'user_id': user.id, 'command': 'spread'}
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка расклада для {user.id}: {e}")
+
+            if placeholder:
+                try:
+                    await placeholder.edit_text(ERROR_MESSAGE)
+                    return
+                except Exception:
+                    pass
+            await update.message.reply_text(ERROR_MESSAGE)
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 """
-Обработчики команд статистики (/stats, /deck)
+Обработчики команд статистики (/stats, /top, /deck)
 """
 
 import logging
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from ..config import Config
+from ..models.user import achievement_titles
+from ..utils.formatting import escape_markdown, render_message
 from ..services.user_service import UserService
 from ..data.tarot_cards import get_cards_by_type, get_total_cards
 
@@ -24,7 +27,7 @@ class StatsHandlers:
     async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команды /stats"""
         user_id = update.effective_user.id
-        user_name = update.effective_user.first_name or "друг"
+        user_name = escape_markdown(update.effective_user.first_name or "друг")
         
         try:
             # Получить статистику пользователя
@@ -43,11 +46,14 @@ class StatsHandlers:
                 # Проверить, можно ли получить предсказание сегодня
                 can_get_today = user.can_get_fortune_today
                 status = "✅ Доступно" if can_get_today else "⏳ Ждите до завтра"
+                achievements = ", ".join(achievement_titles(user.achievements)) or "пока нет"
                 
                 stats_message = f"""
 📊 **Статистика {user_name}:**
 
 🔮 Всего предсказаний: {user.total_fortunes}
+🔥 Дней подряд: {user.active_streak} (рекорд: {user.longest_streak})
+🏅 Достижения: {achievements}
 📅 Последнее предсказание: {user.last_fortune_date or 'неизвестно'}
 🎂 Зарегистрирован: {user.created_at or 'неизвестно'}
 🌟 Сегодняшнее предсказание: {status}
@@ -55,13 +61,36 @@ class StatsHandlers:
 ✨ Каждое обращение к картам приближает вас к мудрости!
                 """
             
-            await update.message.reply_text(stats_message, parse_mode='Markdown')
-            logger.info(f"📊 Пользователь {user_id} запросил статистику")
+            await update.message.reply_text(render_message(stats_message), parse_mode=ParseMode.HTML)
+            logger.info("📊 Пользователь %s запросил статистику", user_id, extra={'user_id': user_id, 'command': 'stats'})
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики для {user_id}: {e}")
             await update.message.reply_text("❌ Произошла ошибка при получении статистики. Попробуйте позже.")
     
+    async def top(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик команды /top - таблицы лидеров"""
+        user_id = update.effective_user.id
+        leaderboard = self.user_service.leaderboard
+        
+        try:
+            sections = []
+            for board, title in (('fortunes', "🔮 **Больше всего предсказаний:**"),
+                                 ('streak', "🔥 **Самые длинные серии (дней подряд):**")):
+                rows = [
+                    f"{place}. {escape_markdown(name)} - {score}"
+                    for place, (_, name, score) in enumerate(leaderboard.top(board), 1)
+                ]
+                sections.append(title + "\n" + ("\n".join(rows) or "Пока никого"))
+            
+            top_message = "🏆 **Таблицы лидеров**\n\n" + "\n\n".join(sections)
+            await update.message.reply_text(render_message(top_message), parse_mode=ParseMode.HTML)
+            logger.info("🏆 Пользователь %s запросил таблицы лидеров", user_id, extra={'user_id': user_id, 'command': 'top'})
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения таблиц лидеров для {user_id}: {e}")
+            await update.message.reply_text("❌ Произошла ошибка при получении таблиц лидеров. Попробуйте позже.")
+    
     async def deck_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обработчик команды /deck - информация о колоде"""
         try:
@@ -89,8 +118,11 @@ class StatsHandlers:
 📚 Fallback на классические толкования карт
             """
             
-            await update.message.reply_text(deck_message, parse_mode='Markdown')
-            logger.info(f"🎴 Пользователь {update.effective_user.id} запросил информацию о колоде")
+            await update.message.reply_text(render_message(deck_message), parse_mode=ParseMode.HTML)
+            logger.info(
+                "🎴 Пользователь %s запросил информацию о колоде", update.effective_user.id,
+                extra={'user_id': update.effective_user.id, 'command': 'deck'}
+            )
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения информации о колоде: {e}")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Ограничение частоты команд: token bucket на пользователя и на команду
+"""
+
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from ..config import Config
+from ..utils.metrics import THROTTLE_BUCKETS, THROTTLED
+
+logger = logging.getLogger(__name__)
+
+# Команды с собственным, более строгим лимитом: (токенов в секунду, запас)
+COMMAND_LIMITS: Dict[str, Tuple[float, int]] = {
+    'spread': (1 / 60, 2),
+}
+
+# Inline запросы приходят на каждое нажатие клавиши, поэтому у них своя корзина с большим
+# запасом, а общий лимит команд они не расходуют. '@' не бывает в имени команды.
+INLINE_SCOPE = '@inline'
+INLINE_LIMIT: Tuple[float, int] = (2.0, 20)
+
+# Как часто просматривать корзины в поисках простаивающих (секунды)
+SWEEP_INTERVAL = 60.0
+
+COOLDOWN_MESSAGE = "⏳ Слишком много запросов. Карты любят неспешность - попробуйте чуть позже."
+
+
+def _scope_label(scope: Optional[str]) -> str:
+    """Метка метрики для корзины"""
+    if scope is None:
+        return 'user'
+    return 'inline' if scope == INLINE_SCOPE else 'command'
+
+
+class TokenBucket:
+    """Запас токенов, пополняемый с постоянной скоростью"""
+    __slots__ = ('tokens', 'updated', 'notified')
+
+    def __init__(self, burst: int, now: float):
+        self.tokens = float(burst)
+        self.updated = now
+        # Предупреждение о лимите уже отправлено в текущей серии отказов
+        self.notified = False
+
+    def refill(self, rate: float, burst: int, now: float) -> bool:
+        """Пополнить запас к моменту now. True, если токен есть."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return self.tokens >= 1
+
+    def take(self):
+        """Взять токен (после успешного refill)"""
+        self.tokens -= 1
+        self.notified = False
+
+
+class ThrottleHandlers:
+    """Проверка лимитов до основных обработчиков (группа -1).
+
+    Превысившее лимит обновление дальше не обрабатывается; на первую команду
+    в серии отказов отправляется одно предупреждение, остальные отбрасываются молча.
+    Корзины, простаивающие дольше времени полного пополнения, удаляются:
+    новая корзина для такого пользователя ничем не отличалась бы от удалённой.
+    """
+
+    def __init__(self, config: Config):
+        """Инициализация лимитов"""
+        self.config = config
+        self._buckets: Dict[Tuple[int, Optional[str]], TokenBucket] = {}
+        self._last_sweep = time.monotonic()
+        THROTTLE_BUCKETS.set_function(lambda: len(self._buckets))
+
+    @property
+    def enabled(self) -> bool:
+        """Ограничение включено"""
+        return self.config.throttle_rate > 0
+
+    def _limits(self, command: Optional[str]) -> Tuple[float, int]:
+        """Скорость пополнения и запас для корзины"""
+        if command is None:
+            return self.config.throttle_rate, self.config.throttle_burst
+        if command == INLINE_SCOPE:
+            return INLINE_LIMIT
+        return COMMAND_LIMITS.get(command, (self.config.throttle_command_rate, self.config.throttle_command_burst))
+
+    def _idle_ttl(self, command: Optional[str]) -> float:
+        """Время полного пополнения корзины"""
+        rate, burst = self._limits(command)
+        return burst / rate if rate > 0 else SWEEP_INTERVAL
+
+    def _sweep(self, now: float):
+        """Удалить корзины, которые успели полностью пополниться"""
+        self._last_sweep = now
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if now - bucket.updated >= self._idle_ttl(key[1])
+        ]
+        for key in idle:
+            del self._buckets[key]
+
+    def _bucket(self, user_id: int, command: Optional[str], now: float) -> TokenBucket:
+        """Корзина пользователя (command=None - общий лимит)"""
+        key = (user_id, command)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self._limits(command)[1], now)
+        return bucket
+
+    def allow(self, user_id: int, command: Optional[str] = None, now: Optional[float] = None) -> Tuple[bool, Optional[TokenBucket]]:
+        """Проверить лимиты. Возвращает (разрешено, корзина, в которой не хватило токенов).
+
+        command=INLINE_SCOPE проверяет только корзину inline запросов.
+        """
+        now = time.monotonic() if now is None else now
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._sweep(now)
+
+        # Токены берутся, только если они есть во всех корзинах: отказ по лимиту одной команды
+        # не должен расходовать общий запас пользователя
+        if command == INLINE_SCOPE:
+            scopes = (INLINE_SCOPE,)
+        else:
+            scopes = (None, command) if command else (None,)
+        buckets = []
+        for scope in scopes:
+            bucket = self._bucket(user_id, scope, now)
+            if not bucket.refill(*self._limits(scope), now):
+                THROTTLED.labels(_scope_label(scope)).inc()
+                return False, bucket
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.take()
+        return True, None
+
+    @staticmethod
+    def _command(update: Update) -> Optional[str]:
+        """Имя команды без / и @имя_бота"""
+        message = update.message
+        if not message or not message.text or not message.text.startswith('/'):
+            return None
+        return message.text.split(maxsplit=1)[0][1:].split('@', 1)[0].lower() or None
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Обработчик группы -1: остановить обработку обновления сверх лимита"""
+        user = update.effective_user
+        if not self.enabled or not user or user.id == self.config.admin_id:
+            return
+
+        if update.inline_query:
+            command = INLINE_SCOPE
+        elif update.message:
+            command = self._command(update)
+        else:
+            # Прочие обновления (нажатия кнопок) лимиты не расходуют
+            return
+
+        allowed, bucket = self.allow(user.id, command)
+        if allowed:
+            return
+
+        if update.inline_query:
+            # Без ответа Telegram показывает бесконечную загрузку: пустой результат без кэширования
+            try:
+                await update.inline_query.answer([], cache_time=0, is_personal=True)
+            except TelegramError as e:
+                logger.debug("Не удалось ответить на ограниченный inline запрос: %s", e)
+        elif not bucket.notified:
+            bucket.notified = True
+            await update.message.reply_text(COOLDOWN_MESSAGE)
+        if command == INLINE_SCOPE:
+            command = 'inline'
+        logger.info(
+            "🚦 Пользователь %s превысил лимит (%s)", user.id, command or 'все обновления',
+            extra={'user_id': user.id, 'command': command}
+        )
+        raise ApplicationHandlerStop
@@ -27,6 +27,7 @@ class TarotCard:
     meaning: str
     card_type: Optional[CardType] = None
     suit: Optional[Suit] = None
+    card_id: Optional[int] = None  # Позиция карты в колоде
     
     def __post_init__(self):
         """Определить тип карты автоматически"""
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Модель расклада Таро
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .card import TarotCard
+
+@dataclass
+class SpreadCard:
+    """Карта на позиции расклада"""
+
+    position: str
+    card: TarotCard
+    reversed: bool = False
+    interpretation: Optional[str] = None
+    ai_used: bool = False
+
+    @property
+    def title(self) -> str:
+        """Название карты с учётом положения"""
+        return f"{self.card.name} (перевёрнутая)" if self.reversed else self.card.name
+
+
+@dataclass
+class Spread:
+    """Расклад: вид и карты по позициям"""
+
+    kind: str
+    title: str
+    cards: List[SpreadCard] = field(default_factory=list)
+
+    @property
+    def ai_positions(self) -> int:
+        """Сколько позиций получили AI толкование"""
+        return sum(1 for card in self.cards if card.ai_used)
@@ -3,11 +3,68 @@
 Модель пользователя
 """
 
+import sys
 from dataclasses import dataclass, asdict
 from datetime import date
-from typing import Optional
+from enum import IntFlag
+from typing import List, Optional
 
-@dataclass
+# __slots__ у dataclass доступны с Python 3.10; на старых версиях модель остаётся обычной
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+class Achievement(IntFlag):
+    """Достижения пользователя: битовая маска в поле User.achievements"""
+    FIRST_FORTUNE = 1
+    STREAK_3 = 2
+    STREAK_7 = 4
+    STREAK_30 = 8
+    STREAK_100 = 16
+    FORTUNES_10 = 32
+    FORTUNES_50 = 64
+    FORTUNES_100 = 128
+    FORTUNES_365 = 256
+
+
+# Пороги достижений: (флаг, поле пользователя, значение); проверяются при каждом предсказании
+ACHIEVEMENT_RULES = (
+    (Achievement.FIRST_FORTUNE, 'total_fortunes', 1),
+    (Achievement.FORTUNES_10, 'total_fortunes', 10),
+    (Achievement.FORTUNES_50, 'total_fortunes', 50),
+    (Achievement.FORTUNES_100, 'total_fortunes', 100),
+    (Achievement.FORTUNES_365, 'total_fortunes', 365),
+    (Achievement.STREAK_3, 'current_streak', 3),
+    (Achievement.STREAK_7, 'current_streak', 7),
+    (Achievement.STREAK_30, 'current_streak', 30),
+    (Achievement.STREAK_100, 'current_streak', 100),
+)
+
+ACHIEVEMENT_TITLES = {
+    Achievement.FIRST_FORTUNE: "🌱 Первое предсказание",
+    Achievement.STREAK_3: "🔥 3 дня подряд",
+    Achievement.STREAK_7: "🔥 Неделя подряд",
+    Achievement.STREAK_30: "🌕 Месяц подряд",
+    Achievement.STREAK_100: "👑 100 дней подряд",
+    Achievement.FORTUNES_10: "🎴 10 предсказаний",
+    Achievement.FORTUNES_50: "🃏 50 предсказаний",
+    Achievement.FORTUNES_100: "🔮 100 предсказаний",
+    Achievement.FORTUNES_365: "📅 365 предсказаний",
+}
+
+
+# Те же правила и названия с обычными int: операции IntFlag на порядок медленнее
+_RULE_BITS = tuple((int(flag), field, threshold) for flag, field, threshold in ACHIEVEMENT_RULES)
+_TITLE_BITS = tuple((int(flag), title) for flag, title in ACHIEVEMENT_TITLES.items())
+
+
+def achievement_titles(flags: int) -> List[str]:
+    """Названия достижений из битовой маски в порядке объявления"""
+    if not flags:
+        return []
+    return [title for flag, title in _TITLE_BITS if flags & flag]
+
+
+@dataclass(**_SLOTS)
 class User:
     """Модель пользователя бота"""
 
@@ -17,6 +74,15 @@ class User:
     first_name: Optional[str] = None
     created_at: Optional[str] = None
     use_ai: bool = True
+    version: int = 0  # Число сохранений; для оптимистичной проверки в транзакциях
+    # Серия дней подряд: обновляется при каждом предсказании, без просмотра истории
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_day: int = 0  # date.toordinal() дня последнего предсказания
+    achievements: int = 0  # Битовая маска Achievement
+    # Сегодняшнее предсказание показано с AI толкованием (для повторного показа, не текст)
+    ai_reading: bool = False
+    last_seen: Optional[str] = None  # День последней активности любого вида (для холодного архива)
     
     def __post_init__(self):
         """Инициализация после создания"""
@@ -32,10 +98,36 @@ class User:
         today = date.today().isoformat()
         return self.last_fortune_date != today
     
-    def update_fortune_date(self):
-        """Обновить дату последнего предсказания"""
-        self.last_fortune_date = date.today().isoformat()
+    @property
+    def active_streak(self) -> int:
+        """Текущая серия с учётом пропуска: серия прервана, если вчера предсказания не было"""
+        if self.last_day >= date.today().toordinal() - 1:
+            return self.current_streak
+        return 0
+    
+    def update_fortune_date(self) -> Achievement:
+        """Обновить дату последнего предсказания, серию и достижения.
+        
+        Возвращает достижения, полученные этим предсказанием.
+        """
+        today = date.today()
+        day = today.toordinal()
+        self.last_fortune_date = today.isoformat()
         self.total_fortunes += 1
+        
+        if self.last_day == day - 1:
+            self.current_streak += 1
+        elif self.last_day != day:
+            self.current_streak = 1
+        self.last_day = day
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        
+        earned = 0
+        for flag, field, threshold in _RULE_BITS:
+            if not self.achievements & flag and getattr(self, field) >= threshold:
+                earned |= flag
+        self.achievements |= earned
+        return Achievement(earned)
     
     def to_dict(self) -> dict:
         """Преобразовать в словарь для сохранения"""
@@ -44,6 +136,13 @@ class User:
     @classmethod
     def from_dict(cls, user_id: int, data: dict) -> 'User':
         """Создать пользователя из словаря"""
+        last_day = data.get('last_day')
+        streak = data.get('current_streak', 0)
+        if last_day is None:
+            # Запись до появления серий: последний день берётся из даты, серия начинается с него
+            last_fortune_date = data.get('last_fortune_date')
+            last_day = date.fromisoformat(last_fortune_date).toordinal() if last_fortune_date else 0
+            streak = 1 if last_day else 0
         return cls(
             user_id=user_id,
             last_fortune_date=data.get('last_fortune_date'),
@@ -51,6 +150,13 @@ class User:
             first_name=data.get('first_name'),
             created_at=data.get('created_at'),
             use_ai=data.get('use_ai', True),
+            version=data.get('version', 0),
+            current_streak=streak,
+            longest_streak=data.get('longest_streak', streak),
+            last_day=last_day,
+            achievements=data.get('achievements', 0),
+            ai_reading=data.get('ai_reading', False),
+            last_seen=data.get('last_seen'),
         )
     
     def get_stats_text(self) -> str:
@@ -59,6 +165,7 @@ class User:
 📊 **Ваша статистика:**
 
 🔮 Всего предсказаний: {self.total_fortunes}
+🔥 Серия: {self.active_streak} (рекорд: {self.longest_streak})
 📅 Последнее предсказание: {self.last_fortune_date or 'никогда'}
 🎂 Зарегистрирован: {self.created_at or 'неизвестно'}
 🌟 Сегодняшнее предсказание: {"✅ Доступно" if self.can_get_fortune_today else "⏳ Ждите до завтра"}
@@ -3,16 +3,25 @@
 Сервис для работы с AI (Groq)
 """
 
+import asyncio
+import importlib.util
+import json
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# Сам openai (вместе с pydantic) импортируется только при создании клиента
+OPENAI_AVAILABLE = importlib.util.find_spec('openai') is not None
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 from ..config import Config
+from ..utils.formatting import sanitize_ai_text
+from ..utils.metrics import AI_ERRORS, AI_EXHAUSTED, AI_FALLBACKS, AI_LATENCY
+from ..utils.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -32,55 +41,212 @@ PROMPT_TEMPLATE = """Ты мастер Таро. Создай краткое т
 
 Ответь только толкованием, без вступлений и комментариев."""
 
+SPREAD_PROMPT_TEMPLATE = """Ты мастер Таро. Истолкуй расклад из {count} карт{user_part}.
+
+Карты по позициям:
+{cards}
+
+Требования:
+- Для каждой позиции 1-2 предложения с учётом смысла позиции и положения карты
+- Перевёрнутая карта - ослабленная или обращённая внутрь энергия, без запугивания
+- Тон: мистический, мудрый, доброжелательный, не больше одного эмоджи на позицию
+- Пиши на русском языке
+
+Ответь только JSON объектом вида:
+{{"positions": [{{"index": 1, "text": "толкование"}}, ...]}}
+с одним элементом для каждой позиции от 1 до {count}."""
+
+
+def parse_spread_response(text: str, count: int) -> Dict[int, str]:
+    """Разобрать JSON ответ на расклад: {номер позиции: толкование} для корректных элементов"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+
+    items = data.get('positions') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return {}
+
+    result = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index, interpretation = item.get('index'), item.get('text')
+        if isinstance(index, int) and 1 <= index <= count and isinstance(interpretation, str) and interpretation.strip():
+            result.setdefault(index, sanitize_ai_text(interpretation))
+    return result
+
 
 class AIService:
     """Сервис для AI толкований через Groq"""
 
     def __init__(self, config: Config):
         self.config = config
-        self._groq_client: Optional[OpenAI] = None
-
-        if OPENAI_AVAILABLE and config.groq_api_key:
-            try:
-                self._groq_client = OpenAI(
-                    api_key=config.groq_api_key,
-                    base_url="https://api.groq.com/openai/v1",
-                )
-                logger.info("🤖 Groq API инициализирован")
-            except Exception as e:
-                logger.error(f"❌ Ошибка инициализации Groq: {e}")
-        else:
+        self._groq_client: Optional['AsyncOpenAI'] = None
+        self._client_failed = False
+        self._client_lock = threading.Lock()
+        # Кэш толкований по ключу (карта, имя, день) и запросы, которые сейчас выполняются
+        self._cache: 'OrderedDict[Tuple[str, Optional[str], str], str]' = OrderedDict()
+        self._pending: Dict[Tuple[str, Optional[str], str], asyncio.Future] = {}
+
+        if not (OPENAI_AVAILABLE and config.groq_api_key):
+            self._client_failed = True
             logger.warning("⚠️ Groq недоступен (нет библиотеки или ключа)")
-
-    async def generate_interpretation(self, card_name: str, user_name: Optional[str] = None) -> Optional[str]:
-        """Сгенерировать толкование через Groq. Вернуть None если провайдер недоступен."""
-        if not self._groq_client:
-            logger.error("❌ Groq недоступен")
-            return None
-
+        elif not config.fast_start:
+            self._create_client()
+
+    def _create_client(self) -> Optional['AsyncOpenAI']:
+        """Импортировать openai и создать клиент Groq (один раз)"""
+        with self._client_lock:
+            if self._groq_client is None and not self._client_failed:
+                try:
+                    from openai import AsyncOpenAI
+
+                    # Асинхронный клиент не занимает event loop на время ответа модели;
+                    # таймаут ограничивает попытку на одну модель (по умолчанию у openai - минуты)
+                    self._groq_client = AsyncOpenAI(
+                        api_key=self.config.groq_api_key,
+                        base_url="https://api.groq.com/openai/v1",
+                        timeout=self.config.ai_timeout,
+                        max_retries=0,
+                    )
+                    logger.info("🤖 Groq API инициализирован")
+                except Exception as e:
+                    self._client_failed = True
+                    logger.error(f"❌ Ошибка инициализации Groq: {e}")
+            return self._groq_client
+
+    async def warm_up(self):
+        """Создать клиент в фоновом потоке, не блокируя event loop"""
+        if self._groq_client is None and not self._client_failed:
+            await asyncio.to_thread(self._create_client)
+
+    def cached_interpretation(self, card_name: str, user_name: Optional[str] = None,
+                              day: Optional[str] = None) -> Optional[str]:
+        """Толкование из кэша без обращения к Groq"""
+        key = (card_name, user_name, day)
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+        return text
+
+    def _store(self, key: Tuple[str, Optional[str], str], task: asyncio.Future):
+        """Положить результат завершённого запроса в кэш"""
+        self._pending.pop(key, None)
+        if task.cancelled() or task.exception() or not task.result():
+            return
+
+        self._cache[key] = task.result()
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.config.interpretation_cache_size:
+            self._cache.popitem(last=False)
+
+    @traced('ai.generate_interpretation')
+    async def generate_interpretation(self, card_name: str, user_name: Optional[str] = None,
+                                      day: Optional[str] = None) -> Optional[str]:
+        """Сгенерировать толкование через Groq. Вернуть None если провайдер недоступен.
+
+        Если указан day, толкование кэшируется на этот день, а одновременные запросы
+        с тем же ключом ждут один общий запрос к Groq.
+        """
+        if day is None:
+            return await self._request_interpretation(card_name, user_name)
+
+        key = (card_name, user_name, day)
+        cached = self.cached_interpretation(*key)
+        if cached is not None:
+            return cached
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_interpretation(card_name, user_name))
+            task.add_done_callback(lambda done: self._store(key, done))
+            self._pending[key] = task
+        # Отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(task)
+
+    async def _request_interpretation(self, card_name: str, user_name: Optional[str] = None) -> Optional[str]:
+        """Запрос толкования одной карты"""
         user_part = f" для {user_name}" if user_name else ""
         prompt = PROMPT_TEMPLATE.format(card_name=card_name, user_part=user_part)
+        # Разметка ответа приводится к безопасной один раз - до кэширования и отправки
+        return await self._complete(prompt, card_name, parse=sanitize_ai_text)
+
+    @traced('ai.generate_spread')
+    async def generate_spread_interpretation(self, positions: List[Tuple[str, str, bool]],
+                                             user_name: Optional[str] = None) -> Dict[int, str]:
+        """Толкования всех позиций расклада одним запросом.
+
+        positions - список (позиция, название карты, перевёрнута ли). Возвращает
+        {номер позиции: толкование} только для позиций с корректным ответом;
+        остальные вызывающий код заполняет классическими значениями.
+        """
+        cards = "\n".join(
+            f"{index}. {position}: {card_name}{' (перевёрнутая)' if is_reversed else ''}"
+            for index, (position, card_name, is_reversed) in enumerate(positions, start=1)
+        )
+        user_part = f" для {user_name}" if user_name else ""
+        prompt = SPREAD_PROMPT_TEMPLATE.format(count=len(positions), user_part=user_part, cards=cards)
+
+        result = await self._complete(
+            prompt,
+            f"расклада из {len(positions)} карт",
+            max_tokens=300 * len(positions) + 200,
+            parse=lambda text: parse_spread_response(text, len(positions)),
+            response_format={"type": "json_object"},
+        )
+        return result or {}
+
+    async def _complete(self, prompt: str, subject: str, max_tokens: int = 1500,
+                        parse: Optional[Callable[[str], Any]] = None, **options) -> Any:
+        """Запрос к Groq с перебором моделей.
+
+        parse разбирает и проверяет ответ; если он вернул пустой результат,
+        запрос повторяется на следующей модели.
+        """
+        client = self._groq_client
+        if client is None:
+            await self.warm_up()
+            client = self._groq_client
+        if client is None:
+            logger.error("❌ Groq недоступен")
+            return None
 
-        for model_name in self.config.groq_models:
+        models = self.config.groq_models
+        for index, model_name in enumerate(models):
+            start = time.perf_counter()
             try:
-                response = self._groq_client.chat.completions.create(
-                    model=model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.8,
-                    max_tokens=1500,
-                    top_p=0.9,
-                )
+                with span('ai.request', model=model_name):
+                    response = await client.chat.completions.create(
+                        model=model_name,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.8,
+                        max_tokens=max_tokens,
+                        top_p=0.9,
+                        **options,
+                    )
+                AI_LATENCY.labels(model_name).observe(time.perf_counter() - start)
                 text = response.choices[0].message.content
                 if text:
-                    logger.info(f"✅ Groq толкование для {card_name} (модель: {model_name})")
-                    return text.strip()
+                    result = parse(text) if parse else text.strip()
+                    if result:
+                        logger.info("✅ Groq толкование для %s (модель: %s)", subject, model_name)
+                        return result
+                    logger.warning("⚠️ Groq модель %s вернула некорректный ответ для %s", model_name, subject)
             except Exception as e:
+                AI_LATENCY.labels(model_name).observe(time.perf_counter() - start)
+                AI_ERRORS.labels(model_name).inc()
                 logger.warning(f"⚠️ Groq модель {model_name} недоступна: {e}")
-                continue
+            if index + 1 < len(models):
+                # После последней модели переходить некуда - это учитывает AI_EXHAUSTED
+                AI_FALLBACKS.labels(model_name).inc()
 
+        AI_EXHAUSTED.inc()
         logger.error("❌ Все модели Groq недоступны")
         return None
 
     @property
     def ai_available(self) -> bool:
-        return self._groq_client is not None
+        """AI доступен, если есть ключ и библиотека (клиент может создаваться лениво)"""
+        return not self._client_failed
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Сервис исторической аналитики: дневные сводки в бинарном файле фиксированного формата
+"""
+
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from ..config import Config
+from ..data.tarot_cards import get_total_cards
+
+logger = logging.getLogger(__name__)
+
+# Заголовок файла: сигнатура, версия формата, число карт, порядковый номер первого дня
+HEADER = struct.Struct('<4sHHI')
+MAGIC = b'TRAN'
+VERSION = 1
+
+# Счётчики дня в порядке хранения, за ними - счётчики по каждой карте колоды
+COUNTERS = ('active', 'new', 'fortunes', 'ai', 'classic', 'repeats')
+
+
+@dataclass
+class DayStats:
+    """Сводка за один день"""
+
+    day: date
+    active: int = 0
+    new: int = 0
+    fortunes: int = 0
+    ai: int = 0
+    classic: int = 0
+    repeats: int = 0
+    cards: Tuple[int, ...] = ()
+
+
+class AnalyticsService:
+    """Дневные сводки по событиям предсказаний.
+
+    Файл - заголовок и массив корзин по дням подряд; корзина дня N лежит по смещению
+    HEADER.size + (N - первый день) * размер корзины. Запись события обновляет одну
+    корзину, запрос за период читает только корзины нужных дней - O(дней), а не O(пользователей).
+    """
+
+    def __init__(self, config: Config, total_cards: Optional[int] = None):
+        """Инициализация сервиса аналитики"""
+        self.filename = config.analytics_file
+        self.total_cards = total_cards or get_total_cards()
+        self.bucket = struct.Struct(f'<{len(COUNTERS) + self.total_cards}I')
+        self._file = None
+        self._epoch: Optional[int] = None
+        # Корзина текущего дня держится в памяти: (порядковый номер дня, счётчики)
+        self._today: Optional[Tuple[int, List[int]]] = None
+        logger.info("📈 AnalyticsService инициализирован")
+
+    def _open(self):
+        """Открыть файл сводок, создав его при первом событии"""
+        if self._file:
+            return self._file
+
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        if os.path.exists(self.filename):
+            self._file = open(self.filename, 'r+b')
+            magic, version, total_cards, epoch = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or total_cards != self.total_cards:
+                self._file.close()
+                self._file = None
+                raise ValueError(f"неподдерживаемый формат файла аналитики: {self.filename}")
+            self._epoch = epoch
+        else:
+            self._epoch = date.today().toordinal()
+            self._file = open(self.filename, 'w+b')
+            self._file.write(HEADER.pack(MAGIC, VERSION, self.total_cards, self._epoch))
+            self._file.flush()
+        return self._file
+
+    def _offset(self, ordinal: int) -> int:
+        """Смещение корзины дня в файле"""
+        return HEADER.size + (ordinal - self._epoch) * self.bucket.size
+
+    def _read_buckets(self, first: int, count: int) -> List[Tuple[int, ...]]:
+        """Прочитать count корзин подряд, начиная с дня first. Отсутствующие дни - нули."""
+        empty = (0,) * (len(COUNTERS) + self.total_cards)
+        f = self._open()
+        start = max(first, self._epoch)
+        buckets = [empty] * max(0, min(count, start - first))
+        if len(buckets) == count:
+            return buckets
+
+        f.seek(self._offset(start))
+        data = f.read((count - len(buckets)) * self.bucket.size)
+        whole = len(data) - len(data) % self.bucket.size
+        buckets.extend(values for values in self.bucket.iter_unpack(data[:whole]))
+        buckets.extend([empty] * (count - len(buckets)))
+        return buckets
+
+    def _record(self, card_id: Optional[int] = None, **increments: int):
+        """Увеличить счётчики сегодняшней корзины и записать её в файл"""
+        try:
+            f = self._open()
+            ordinal = date.today().toordinal()
+            if ordinal < self._epoch:
+                return
+
+            if not self._today or self._today[0] != ordinal:
+                self._today = (ordinal, list(self._read_buckets(ordinal, 1)[0]))
+            counters = self._today[1]
+
+            for name, value in increments.items():
+                counters[COUNTERS.index(name)] += value
+            if card_id is not None and 0 <= card_id < self.total_cards:
+                counters[len(COUNTERS) + card_id] += 1
+
+            # Дни без событий между последней корзиной и сегодняшней заполняются нулями при записи
+            f.seek(self._offset(ordinal))
+            f.write(self.bucket.pack(*counters))
+            f.flush()
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи аналитики: {e}")
+
+    def record_fortune(self, card_id: Optional[int], ai_used: bool, new_user: bool = False, active: bool = True):
+        """Учесть выданное ежедневное предсказание.
+
+        active - предсказание выдано пользователю: личное предсказание бывает одно в день,
+        поэтому счётчик active считает уникальных пользователей (DAU). Карта дня чата
+        пользователем не является и передаёт active=False.
+        """
+        self._record(
+            card_id,
+            active=int(active),
+            new=int(new_user),
+            fortunes=1,
+            ai=int(ai_used),
+            classic=int(not ai_used),
+        )
+
+    def record_repeat(self):
+        """Учесть повторный запрос предсказания в тот же день"""
+        self._record(repeats=1)
+
+    def get_range(self, days: int, end: Optional[date] = None) -> List[DayStats]:
+        """Сводки за последние days дней (включая end, по умолчанию сегодня)"""
+        end = end or date.today()
+        first = end - timedelta(days=days - 1)
+        try:
+            buckets = self._read_buckets(first.toordinal(), days)
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения аналитики: {e}")
+            buckets = []
+
+        result = []
+        for index, values in enumerate(buckets):
+            counters = dict(zip(COUNTERS, values))
+            result.append(DayStats(
+                day=first + timedelta(days=index),
+                cards=tuple(values[len(COUNTERS):]),
+                **counters,
+            ))
+        return result
+
+    def close(self):
+        """Закрыть файл сводок"""
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Поисковый индекс по колоде для inline-режима
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Set, Tuple
+
+from ..models.card import TarotCard
+
+logger = logging.getLogger(__name__)
+
+# Максимум результатов в ответе на inline запрос (ограничение Telegram)
+MAX_RESULTS = 50
+
+
+def normalize(text: str) -> str:
+    """Привести текст к виду для поиска: нижний регистр, ё → е, без пунктуации"""
+    text = text.lower().replace('ё', 'е')
+    return ''.join(ch if ch.isalnum() else ' ' for ch in text)
+
+
+def trigrams(word: str) -> Set[str]:
+    """Триграммы слова (слово дополняется пробелами по краям)"""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CardIndex:
+    """Префиксный и триграммный индекс по названиям и значениям карт"""
+
+    def __init__(self, cards: Sequence[TarotCard], memo_size: int = 1024):
+        """Построить индекс. Идентификатор карты - её позиция в колоде."""
+        self.cards = list(cards)
+        self.memo_size = memo_size
+
+        # Префиксы слов названия -> карты
+        self._name_prefixes: Dict[str, Set[int]] = {}
+        # Триграммы слов названия и значения -> карты
+        self._trigrams: Dict[str, Set[int]] = {}
+        # Результаты уже встречавшихся запросов
+        self._memo: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+
+        for card_id, card in enumerate(self.cards):
+            for word in normalize(card.name).split():
+                for end in range(1, len(word) + 1):
+                    self._name_prefixes.setdefault(word[:end], set()).add(card_id)
+            for word in normalize(f"{card.name} {card.meaning}").split():
+                for gram in trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(card_id)
+
+        self._all_ids = tuple(range(len(self.cards)))
+        logger.info(f"🔎 CardIndex построен: {len(self._name_prefixes)} префиксов, {len(self._trigrams)} триграмм")
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> Tuple[int, ...]:
+        """Найти карты по запросу. Совпадения в названии идут первыми."""
+        key = normalize(query).strip()
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            return cached[:limit]
+
+        result = self._search(key)
+        self._memo[key] = result
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return result[:limit]
+
+    def _search(self, key: str) -> Tuple[int, ...]:
+        """Поиск без кэша запросов"""
+        words = key.split()
+        if not words:
+            return self._all_ids
+
+        name_hits: Set[int] = set(self._all_ids)
+        text_hits: Set[int] = set(self._all_ids)
+        for word in words:
+            name_hits &= self._name_prefixes.get(word, set())
+            text_hits &= self._match_trigrams(word)
+            if not name_hits and not text_hits:
+                return ()
+
+        ranked: List[int] = sorted(name_hits)
+        ranked.extend(sorted(text_hits - name_hits))
+        return tuple(ranked)
+
+    def _match_trigrams(self, word: str) -> Set[int]:
+        """Карты, содержащие все триграммы слова"""
+        if len(word) < 3:
+            return set()
+
+        grams = trigrams(word)
+        # Краевая триграмма конца слова не нужна: запрос может быть префиксом
+        grams.discard(f"{word[-2:]} ")
+        hits = None
+        for gram in sorted(grams, key=lambda g: len(self._trigrams.get(g, ()))):
+            ids = self._trigrams.get(gram)
+            if not ids:
+                return set()
+            hits = set(ids) if hits is None else hits & ids
+            if not hits:
+                return set()
+        return hits or set()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Холодный архив неактивных пользователей: сжатые сегменты и индекс принадлежности
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'index.json'
+
+
+class ColdStorage:
+    """Архив пользователей, не заходивших давно.
+
+    Каждый запуск архивации пишет один сегмент segment-<время>.json.gz со всеми
+    вынесенными пользователями. Индекс (index.json) хранит для каждого сегмента
+    его участников и их число предсказаний - этого хватает, чтобы ответить
+    "в архиве ли пользователь" и посчитать общую статистику, не открывая сегменты.
+    Восстановленный пользователь удаляется из индекса; сегмент без участников удаляется.
+    """
+
+    def __init__(self, directory: str):
+        """Инициализация архива и загрузка индекса"""
+        self.directory = directory
+        self.index_file = os.path.join(directory, INDEX_FILENAME)
+        # Сегмент -> {user_id: total_fortunes}
+        self._segments: Dict[str, Dict[int, int]] = {}
+        # user_id -> сегмент
+        self._members: Dict[int, str] = {}
+        self._load_index()
+
+    def _load_index(self):
+        """Прочитать индекс с диска"""
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Ошибка чтения индекса архива {self.index_file}: {e}")
+            return
+
+        for segment, members in raw.items():
+            self._segments[segment] = {int(user_id): fortunes for user_id, fortunes in members.items()}
+            for user_id in self._segments[segment]:
+                self._members[user_id] = segment
+        logger.info(f"🧊 Архив: {len(self._members)} пользователей в {len(self._segments)} сегментах")
+
+    def _save_index(self):
+        """Записать индекс атомарно: сначала во временный файл, затем заменить"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._segments, f, separators=(',', ':'))
+        os.replace(tmp, self.index_file)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    @property
+    def total_fortunes(self) -> int:
+        """Сумма предсказаний архивных пользователей"""
+        return sum(sum(members.values()) for members in self._segments.values())
+
+    def members(self) -> Iterator[Tuple[int, int]]:
+        """Архивные пользователи и их число предсказаний: (user_id, total_fortunes)"""
+        for members in self._segments.values():
+            yield from members.items()
+
+    def archive(self, users: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """Записать пользователей новым сегментом. Возвращает имя сегмента."""
+        if not users:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        segment = f"segment-{datetime.now():%Y%m%d_%H%M%S_%f}.json.gz"
+        path = os.path.join(self.directory, segment)
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            json.dump(users, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+        # После сбоя между записью сегмента и основной базы пользователь уже может быть в старом сегменте
+        self._forget(int(user_id) for user_id in users)
+        self._segments[segment] = {
+            int(user_id): data.get('total_fortunes', 0) for user_id, data in users.items()
+        }
+        for user_id in self._segments[segment]:
+            self._members[user_id] = segment
+        self._save_index()
+        return segment
+
+    def restore(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Данные пользователя из архива (без удаления из индекса - см. forget)"""
+        segment = self._members.get(user_id)
+        if segment is None:
+            return None
+        try:
+            with gzip.open(os.path.join(self.directory, segment), 'rt', encoding='utf-8') as f:
+                return json.load(f).get(str(user_id))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Ошибка чтения сегмента архива {segment}: {e}")
+            return None
+
+    def forget(self, user_id: int):
+        """Убрать пользователя из индекса после возвращения в основную базу"""
+        if user_id in self._members:
+            self._forget((user_id,))
+            self._save_index()
+
+    def _forget(self, user_ids: Iterable[int]):
+        """Убрать пользователей из индекса в памяти; опустевшие сегменты удаляются"""
+        emptied = set()
+        for user_id in user_ids:
+            segment = self._members.pop(user_id, None)
+            if segment is None:
+                continue
+            members = self._segments[segment]
+            members.pop(user_id, None)
+            if not members:
+                emptied.add(segment)
+
+        for segment in emptied:
+            del self._segments[segment]
+            try:
+                os.remove(os.path.join(self.directory, segment))
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось удалить пустой сегмент {segment}: {e}")
+
+    def get_stats(self) -> Tuple[int, int, int]:
+        """(пользователей, сегментов, байт на диске)"""
+        size = 0
+        for segment in self._segments:
+            try:
+                size += os.path.getsize(os.path.join(self.directory, segment))
+            except OSError:
+                pass
+        return len(self._members), len(self._segments), size
+
+    def reset_with_backup(self, backup_dir: str) -> str:
+        """Перенести архив в директорию бэкапов и начать с пустого"""
+        self._segments.clear()
+        self._members.clear()
+        if not os.path.isdir(self.directory):
+            return ""
+        os.makedirs(backup_dir, exist_ok=True)
+        backup_path = os.path.join(backup_dir, f"cold_backup_{datetime.now():%Y%m%d_%H%M%S}")
+        shutil.move(self.directory, backup_path)
+        logger.info(f"💾 Архив перенесён в бэкап: {backup_path}")
+        return backup_path
@@ -1,50 +1,92 @@
 # -*- coding: utf-8 -*-
 """
-Сервис для работы с базой данных (JSON файл)
+Сервис для работы с базой данных (файл в формате STORAGE_FORMAT)
 """
 
-import json
 import os
 import shutil
 import logging
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from ..utils.metrics import DB_FILE_BYTES, DB_LOAD_SECONDS, DB_SAVE_SECONDS
+from .serializers import PrettyJSONSerializer, Serializer, detect_format, reader_for
+from ..utils.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 class Database:
-    """Простая JSON база данных для пользователей"""
+    """Простая файловая база данных для пользователей"""
     
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, serializer: Optional[Serializer] = None):
         """Инициализация базы данных"""
         self.filename = filename
+        self.serializer = serializer or PrettyJSONSerializer()
         # Создать директорию если не существует
         os.makedirs(os.path.dirname(filename), exist_ok=True)
-        logger.info(f"💾 Database инициализирована: {filename}")
+        self._migrate()
+        logger.info(f"💾 Database инициализирована: {filename} ({self.serializer.name})")
     
+    def _migrate(self):
+        """Переписать файл в выбранном формате, если он сохранён в другом"""
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb') as f:
+            raw = f.read()
+        disk_format = detect_format(raw)
+        if disk_format is None or disk_format == self.serializer.disk_format:
+            return
+        
+        data = reader_for(disk_format, self.serializer).loads(raw)
+        self.save_all_data(data)
+        logger.info(f"🔄 База {self.filename} переведена из формата {disk_format} в {self.serializer.name}")
+    
+    @traced('db.load_all_data')
     def load_all_data(self) -> Dict[str, Dict[str, Any]]:
         """Загрузить все данные из файла"""
+        start = time.perf_counter()
         try:
             if not os.path.exists(self.filename):
                 return {}
             
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.filename, 'rb') as f:
+                raw = f.read()
+            DB_FILE_BYTES.set(len(raw))
+            if not raw:
+                return {}
+            return reader_for(detect_format(raw), self.serializer).loads(raw)
                 
-        except json.JSONDecodeError:
-            logger.error(f"❌ Ошибка чтения JSON файла: {self.filename}")
+        except (ValueError, TypeError) as e:
+            # json/orjson/msgspec/msgpack сообщают о повреждённых данных через ValueError
+            logger.error(f"❌ Ошибка чтения файла базы {self.filename}: {e}")
             return {}
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки данных: {e}")
             return {}
+        finally:
+            DB_LOAD_SECONDS.observe(time.perf_counter() - start)
     
+    @traced('db.save_all_data')
     def save_all_data(self, data: Dict[str, Dict[str, Any]]):
-        """Сохранить все данные в файл"""
+        """Сохранить все данные в файл. Запись атомарная: временный файл заменяет основной."""
+        start = time.perf_counter()
+        tmp = self.filename + '.tmp'
         try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            raw = self.serializer.dumps(data)
+            with open(tmp, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp, self.filename)
+            DB_FILE_BYTES.set(len(raw))
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения данных: {e}")
+            # Недописанный временный файл не нужен: основной файл остался прежним
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        finally:
+            DB_SAVE_SECONDS.observe(time.perf_counter() - start)
     
     def get_user_data(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получить данные пользователя"""
@@ -79,7 +121,8 @@ class Database:
             os.makedirs(backup_dir, exist_ok=True)
 
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = os.path.join(backup_dir, f"users_data_backup_{timestamp}.json")
+            # Файл приведён к формату сериализатора при запуске (_migrate)
+            backup_path = os.path.join(backup_dir, f"users_data_backup_{timestamp}{self.serializer.extension}")
             shutil.copy(self.filename, backup_path)
 
             os.remove(self.filename)
@@ -3,46 +3,85 @@
 Сервис для работы с предсказаниями
 """
 
+import asyncio
+import hashlib
+import hmac
 import logging
 import random
-from typing import Optional
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 from ..config import Config
 from ..models.card import TarotCard
+from ..models.user import User, achievement_titles
 from ..data.tarot_cards import tarot_deck, fortune_templates
 from .ai_service import AIService
-from .user_service import UserService
+from .analytics_service import AnalyticsService
+from .user_service import UserConflictError, UserService
+from ..utils.metrics import FORTUNES, FORTUNE_UPGRADES
+from ..utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Сколько раз повторять транзакцию предсказания при параллельном изменении пользователя
+CONFLICT_RETRIES = 3
+
+@lru_cache(maxsize=None)
+def shared_deck() -> List[TarotCard]:
+    """Объекты TarotCard колоды: создаются при первом обращении, один раз на процесс"""
+    return [
+        TarotCard(name=card['name'], meaning=card['meaning'], card_id=card_id)
+        for card_id, card in enumerate(tarot_deck)
+    ]
+
+
 class FortuneService:
     """Сервис для генерации предсказаний"""
     
-    def __init__(self, config: Config, ai_service: AIService, user_service: UserService):
+    def __init__(self, config: Config, ai_service: AIService, user_service: UserService,
+                 analytics: Optional[AnalyticsService] = None):
         """Инициализация сервиса предсказаний"""
         self.config = config
         self.ai_service = ai_service
         self.user_service = user_service
-        
-        # Преобразовать данные карт в объекты TarotCard
-        self.cards = [TarotCard(name=card['name'], meaning=card['meaning']) for card in tarot_deck]
-        
-        logger.info(f"🎴 FortuneService инициализирован с {len(self.cards)} картами")
+        self.analytics = analytics
+        logger.info("🎴 FortuneService инициализирован")
     
-    def draw_random_card(self) -> TarotCard:
+    @property
+    def cards(self) -> List[TarotCard]:
+        """Объекты TarotCard колоды (общие для всех ботов процесса)"""
+        return shared_deck()
+    
+    def draw_random_card(self, rng: Optional[random.Random] = None) -> TarotCard:
         """Вытянуть случайную карту из колоды"""
-        return random.choice(self.cards)
+        return (rng or random).choice(self.cards)
+    
+    def draw_rng(self, user_id: int, day: str) -> random.Random:
+        """Генератор расклада на день для пользователя или чата: seed = HMAC-SHA256(секрет, id:дата)"""
+        digest = hmac.new(
+            self.config.draw_secret.encode('utf-8'),
+            f"{user_id}:{day}".encode('utf-8'),
+            hashlib.sha256
+        ).digest()
+        return random.Random(int.from_bytes(digest, 'big'))
     
-    async def generate_fortune_message(self, card: TarotCard, user_name: Optional[str] = None, use_ai: bool = True) -> tuple[str, bool]:
-        """Сгенерировать сообщение с предсказанием. Возвращает (текст, использован_ли_AI)."""
+    @traced('fortune.generate_message')
+    async def generate_fortune_message(self, card: TarotCard, user_name: Optional[str] = None, use_ai: bool = True,
+                                       rng: Optional[random.Random] = None, day: Optional[str] = None) -> tuple[str, bool]:
+        """Сгенерировать сообщение с предсказанием. Возвращает (текст, использован_ли_AI).
+
+        rng и day задаются в детерминированном режиме: шаблон выбирается генератором расклада,
+        а толкование кэшируется на день.
+        """
         if use_ai and self.ai_service.ai_available:
-            ai_interpretation = await self.ai_service.generate_interpretation(card.name, user_name)
+            ai_interpretation = await self.ai_service.generate_interpretation(card.name, user_name, day=day)
             if ai_interpretation:
-                return self._format_ai_fortune(card, ai_interpretation), True
+                return self.format_ai_fortune(card, ai_interpretation, rng), True
 
-        return self._format_classic_fortune(card), False
+        return self._format_classic_fortune(card, rng), False
     
-    def _format_ai_fortune(self, card: TarotCard, ai_interpretation: str) -> str:
+    def format_ai_fortune(self, card: TarotCard, ai_interpretation: str, rng: Optional[random.Random] = None) -> str:
         """Форматировать AI предсказание"""
         ai_templates = [
             "🔮 Карта дня - **{name}**\n\n{ai_meaning}\n\n💫 Пусть это послание направляет вас сегодня!",
@@ -50,45 +89,161 @@ class FortuneService:
             "✨ Карты заговорили! **{name}** несёт особое послание.\n\n{ai_meaning}\n\n🌙 Примите это руководство с открытым сердцем."
         ]
         
-        template = random.choice(ai_templates)
+        template = (rng or random).choice(ai_templates)
         return template.format(name=card.name, ai_meaning=ai_interpretation)
     
-    def _format_classic_fortune(self, card: TarotCard) -> str:
+    def _format_classic_fortune(self, card: TarotCard, rng: Optional[random.Random] = None) -> str:
         """Форматировать классическое предсказание"""
-        template = random.choice(fortune_templates)
+        template = (rng or random).choice(fortune_templates)
         return template.format(name=card.name, meaning=card.meaning)
     
+    @traced('fortune.get_daily_fortune')
     async def get_daily_fortune(self, user_id: int, first_name: Optional[str] = None) -> dict:
-        """Получить ежедневное предсказание для пользователя"""
-        # Загрузить пользователя один раз для проверки
-        user = self.user_service.get_user(user_id, first_name)
-
-        if not user.can_get_fortune_today:
-            return {
-                'success': False,
-                'type': 'already_used',
-                'stats': UserService.user_stats(user)
-            }
-
-        # Вытянуть карту
-        card = self.draw_random_card()
-
-        # Сгенерировать предсказание ДО обновления даты,
-        # чтобы при ошибке AI пользователь не потерял попытку
-        use_ai = user.use_ai and self.ai_service.ai_available
-        fortune_message, ai_used = await self.generate_fortune_message(card, first_name, use_ai=use_ai)
-
-        # Обновить дату и получить статистику за одну операцию (1 read + 1 write)
-        updated_stats = self.user_service.record_fortune(user_id, first_name)
+        """Получить ежедневное предсказание для пользователя.
+        
+        Пользователь читается и сохраняется одной транзакцией. Если параллельная команда
+        успела изменить его раньше, транзакция повторяется с уже готовым предсказанием:
+        второй /fortune в тот же день увидит обновлённую дату и получит ответ о повторе.
+        """
+        fortune = None
+        committed = False
+        try:
+            for _ in range(CONFLICT_RETRIES):
+                try:
+                    async with self.user_service.transaction(user_id, first_name) as user:
+                        if not user.can_get_fortune_today:
+                            return self._already_used(user)
+                        
+                        if fortune is None:
+                            # Сгенерировать предсказание ДО обновления даты,
+                            # чтобы при ошибке AI пользователь не потерял попытку
+                            fortune = await self._draw_fortune(user, first_name)
+                        earned = user.update_fortune_date()
+                        # Повторный показ должен воспроизвести тот же вид толкования
+                        user.ai_reading = fortune[2]
+                    committed = True
+                    break
+                except UserConflictError:
+                    logger.info("🔁 Повтор транзакции предсказания для %s", user_id, extra={'user_id': user_id})
+            else:
+                raise UserConflictError(f"не удалось сохранить предсказание пользователя {user_id}")
+        finally:
+            if not committed and fortune is not None and fortune[3] is not None:
+                # Вытянутое предсказание не сохранено (параллельный /fortune успел раньше или
+                # повторы исчерпаны): его фоновое AI толкование никто не получит
+                fortune[3].cancel()
+        
+        card, fortune_message, ai_used, ai_task = fortune
+        # Считаются только выданные предсказания, а не вытянутые в проигравшей транзакции
+        FORTUNES.labels('ai' if ai_used else 'classic').inc()
+        stats = UserService.user_stats(user)
+        logger.info("🔮 Пользователь %s получил предсказание", user_id, extra={'user_id': user_id})
+        if self.analytics:
+            self.analytics.record_fortune(card.card_id, ai_used, new_user=stats['total_fortunes'] == 1)
 
         return {
             'success': True,
             'type': 'new_fortune',
             'card': card,
             'message': fortune_message,
-            'stats': updated_stats,
-            'ai_used': ai_used
+            'stats': stats,
+            'ai_used': ai_used,
+            # AI толкование, не успевшее к дедлайну: ответ обновится, когда оно придёт
+            'ai_task': ai_task,
+            'new_achievements': earned
+        }
+    
+    async def _draw_fortune(self, user: User, first_name: Optional[str]) -> Tuple[TarotCard, str, bool, Optional[asyncio.Future]]:
+        """Вытянуть карту и сгенерировать текст.
+        
+        Возвращает (карта, текст, использован_ли_AI, фоновая задача AI или None).
+        """
+        rng = day = user_name = None
+        if self.config.deterministic_draw:
+            # Толкование общее для карты на день, поэтому без имени - его кэш переживёт повторы
+            day = date.today().isoformat()
+            rng = self.draw_rng(user.user_id, day)
+        else:
+            user_name = first_name
+        card = self.draw_random_card(rng)
+
+        use_ai = user.use_ai and self.ai_service.ai_available
+        if use_ai and self.config.ai_deadline > 0:
+            return await self.draw_with_deadline(card, user_name, rng, day)
+        
+        fortune_message, ai_used = await self.generate_fortune_message(card, user_name, use_ai=use_ai, rng=rng, day=day)
+        return card, fortune_message, ai_used, None
+    
+    async def draw_with_deadline(self, card: TarotCard, user_name: Optional[str], rng: Optional[random.Random],
+                                  day: Optional[str]) -> Tuple[TarotCard, str, bool, Optional[asyncio.Future]]:
+        """Ждать AI не дольше AI_DEADLINE; иначе классический текст и задача AI, продолжающая работу"""
+        task = asyncio.ensure_future(self.ai_service.generate_interpretation(card.name, user_name, day=day))
+        done, _ = await asyncio.wait({task}, timeout=self.config.ai_deadline)
+        
+        if done and task.exception() is None and task.result():
+            return card, self.format_ai_fortune(card, task.result(), rng), True, None
+        
+        return card, self._format_classic_fortune(card, rng), False, None if done else task
+    
+    async def upgrade_fortune(self, user_id: int, result: dict) -> Optional[dict]:
+        """Дождаться фонового AI толкования. Возвращает результат с AI текстом или None.
+        
+        Предсказание на сегодня уже сохранено; у пользователя отмечается только,
+        что показано AI толкование - повторный показ должен его воспроизвести.
+        """
+        interpretation = await result['ai_task']
+        if not interpretation:
+            FORTUNE_UPGRADES.labels('failed').inc()
+            return None
+        
+        FORTUNE_UPGRADES.labels('upgraded').inc()
+        self.user_service.mark_ai_reading(user_id)
+        rng = None
+        if self.config.deterministic_draw:
+            # Тот же выбор шаблона, что покажет повторный /fortune (get_repeat_reading)
+            rng = self.draw_rng(user_id, result['stats']['last_fortune_date'])
+            self.draw_random_card(rng)
+        card = result['card']
+        return dict(result, message=self.format_ai_fortune(card, interpretation, rng), ai_used=True, ai_task=None)
+    
+    def _already_used(self, user: User) -> dict:
+        """Ответ на повторный запрос в тот же день"""
+        if self.analytics:
+            self.analytics.record_repeat()
+        result = {
+            'success': False,
+            'type': 'already_used',
+            'stats': UserService.user_stats(user)
         }
+        # В детерминированном режиме сегодняшний расклад восстанавливается без записи в базу
+        repeat = self.get_repeat_reading(user)
+        if repeat:
+            result.update(repeat, type='repeat')
+        return result
+    
+    def get_repeat_reading(self, user: User) -> Optional[dict]:
+        """Восстановить сегодняшний расклад пользователя (только в детерминированном режиме).
+
+        Карта и шаблон повторяют исходный выбор. Вид толкования берётся из записи
+        пользователя (ai_reading), а не из текущей настройки /ai: AI текст - из кэша,
+        а если его там нет (например, после перезапуска) - показывается классическое.
+        """
+        if not self.config.deterministic_draw or not user.last_fortune_date:
+            return None
+
+        day = user.last_fortune_date
+        rng = self.draw_rng(user.user_id, day)
+        card = self.draw_random_card(rng)
+
+        interpretation = None
+        if user.ai_reading:
+            interpretation = self.ai_service.cached_interpretation(card.name, day=day)
+        if interpretation:
+            message = self.format_ai_fortune(card, interpretation, rng)
+        else:
+            message = self._format_classic_fortune(card, rng)
+
+        return {'card': card, 'message': message, 'ai_used': bool(interpretation)}
     
     def get_waiting_message(self, user_name: str, stats: dict) -> str:
         """Получить сообщение ожидания"""
@@ -105,16 +260,31 @@ class FortuneService:
 💫 Пусть сегодняшнее послание направляет вас до завтрашнего рассвета!
         """
     
+    def get_repeat_message(self, user_name: str, result: dict) -> str:
+        """Повторный показ сегодняшнего предсказания"""
+        return (
+            f"🌙 {user_name}, карты уже открыли вам свои тайны сегодня. Напоминаю ваше послание:\n\n"
+            f"{result['message']}\n\n"
+            f"🕐 Новое предсказание будет доступно завтра!"
+        )
+    
     def format_fortune_response(self, user_name: str, result: dict) -> str:
         """Форматировать итоговый ответ с предсказанием"""
         if not result['success']:
+            if result.get('message'):
+                return self.get_repeat_message(user_name, result)
             return self.get_waiting_message(user_name, result['stats'])
         
         stats = result['stats']
         message = result['message']
         
         # Информация об источнике толкования
-        source_info = "🤖 Персональное AI толкование" if result['ai_used'] else "📚 Классическое толкование"
+        if result['ai_used']:
+            source_info = "🤖 Персональное AI толкование"
+        elif result.get('ai_task'):
+            source_info = "📚 Классическое толкование (🤖 AI толкование появится здесь, как только будет готово)"
+        else:
+            source_info = "📚 Классическое толкование"
         
         # Основное сообщение
         full_message = f"Привет, {user_name}! 🌟\n\n{message}\n\n"
@@ -126,6 +296,13 @@ class FortuneService:
         else:
             full_message += f"📊 Это ваше {total}-е предсказание\n\n"
         
+        streak = stats.get('current_streak', 0)
+        if streak > 1:
+            full_message += f"🔥 Дней подряд: {streak}\n\n"
+        earned = result.get('new_achievements')
+        if earned:
+            full_message += "🏅 Новые достижения: " + ", ".join(achievement_titles(earned)) + "\n\n"
+        
         full_message += f"{source_info}\n💫 Помните: новое предсказание будет доступно завтра!"
         
         return full_message
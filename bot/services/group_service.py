@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Общая карта дня для групповых чатов
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import date
+from typing import Any, Dict, Optional
+
+from ..config import Config
+from ..models.card import TarotCard
+from .fortune_service import FortuneService
+from ..utils.metrics import FORTUNES, FORTUNE_UPGRADES
+from ..utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+class GroupFortuneService:
+    """Одна карта дня на групповой чат.
+
+    Карта вытягивается при первом /fortune в чате за день генератором расклада чата
+    (HMAC от id чата и даты), толкование запрашивается у AI один раз. Готовый текст
+    хранится в памяти и в небольшом файле group_cards.json, поэтому остальные участники
+    и перезапуск бота получают его без повторного расклада и запроса к AI.
+    """
+
+    def __init__(self, config: Config, fortune_service: FortuneService):
+        """Инициализация сервиса и загрузка сегодняшних карт"""
+        self.config = config
+        self.fortune_service = fortune_service
+        self.user_service = fortune_service.user_service
+        self.filename = config.group_cards_file
+        # chat_id -> {'day', 'card_id', 'message', 'ai_used', 'message_id'}; только сегодняшние
+        self._cards: Dict[int, Dict[str, Any]] = {}
+        # Расклады в процессе: параллельные /fortune в одном чате ждут один общий
+        self._pending: Dict[int, asyncio.Future] = {}
+        # AI толкования, не успевшие к AI_DEADLINE: chat_id -> задача, True если карта обновлена
+        self._upgrades: Dict[int, asyncio.Future] = {}
+        self._load()
+        logger.info("👥 GroupFortuneService инициализирован")
+
+    def _load(self):
+        """Прочитать сегодняшние карты чатов с диска"""
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Ошибка чтения карт чатов {self.filename}: {e}")
+            return
+
+        today = date.today().isoformat()
+        self._cards = {int(chat_id): entry for chat_id, entry in raw.items() if entry.get('day') == today}
+        for entry in self._cards.values():
+            # Фоновые запросы AI не переживают перезапуск: карта остаётся классической
+            entry['ai_pending'] = False
+
+    def _save(self):
+        """Записать карты атомарно; вчерашние записи отбрасываются"""
+        today = date.today().isoformat()
+        self._cards = {chat_id: entry for chat_id, entry in self._cards.items() if entry['day'] == today}
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp = self.filename + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._cards, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, self.filename)
+        except OSError as e:
+            logger.error(f"❌ Ошибка сохранения карт чатов: {e}")
+
+    def get_cached_card(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Сегодняшняя карта чата, если уже вытянута"""
+        return self._today(chat_id)
+
+    def _today(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Сегодняшняя карта чата из памяти"""
+        entry = self._cards.get(chat_id)
+        if entry and entry['day'] == date.today().isoformat():
+            return entry
+        return None
+
+    async def get_daily_card(self, chat_id: int) -> Dict[str, Any]:
+        """Карта дня чата: из памяти или новый расклад (один на чат, даже при параллельных вызовах)"""
+        entry = self._today(chat_id)
+        if entry is not None:
+            return entry
+
+        task = self._pending.get(chat_id)
+        if task is None:
+            task = asyncio.ensure_future(self._draw(chat_id))
+            task.add_done_callback(lambda _: self._pending.pop(chat_id, None))
+            self._pending[chat_id] = task
+        # Отмена одного ожидающего не должна отменять общий расклад
+        return await asyncio.shield(task)
+
+    @traced('group.draw')
+    async def _draw(self, chat_id: int) -> Dict[str, Any]:
+        """Вытянуть карту чата и получить толкование"""
+        day = date.today().isoformat()
+        rng = self.fortune_service.draw_rng(chat_id, day)
+        card = self.fortune_service.draw_random_card(rng)
+        # Без имени: толкование общее для чата и кэшируется AIService на день
+        ai_task = None
+        if self.fortune_service.ai_service.ai_available and self.config.ai_deadline > 0:
+            # Как и в личном /fortune: не дольше AI_DEADLINE, затем классический текст и обновление позже
+            _, message, ai_used, ai_task = await self.fortune_service.draw_with_deadline(card, None, rng, day)
+        else:
+            message, ai_used = await self.fortune_service.generate_fortune_message(
+                card, None, use_ai=True, rng=rng, day=day
+            )
+        FORTUNES.labels('ai' if ai_used else 'classic').inc()
+        if self.fortune_service.analytics:
+            self.fortune_service.analytics.record_fortune(card.card_id, ai_used, active=False)
+
+        entry = {
+            'day': day, 'card_id': card.card_id, 'message': message, 'ai_used': ai_used,
+            'ai_pending': ai_task is not None, 'message_id': None
+        }
+        self._cards[chat_id] = entry
+        self._save()
+        if ai_task is not None:
+            upgrade = asyncio.ensure_future(self._upgrade(chat_id, entry, ai_task))
+            upgrade.add_done_callback(lambda _: self._upgrades.pop(chat_id, None))
+            self._upgrades[chat_id] = upgrade
+        logger.info("🃏 Карта дня чата %s: %s (%s)", chat_id, card.name, 'AI' if ai_used else 'классическое')
+        return entry
+
+    async def _upgrade(self, chat_id: int, entry: Dict[str, Any], ai_task: asyncio.Future) -> bool:
+        """Дождаться фонового AI толкования и заменить им текст карты. True, если карта обновлена."""
+        try:
+            interpretation = await ai_task
+        except Exception as e:
+            logger.warning("⚠️ AI толкование карты чата %s не получено: %s", chat_id, e)
+            interpretation = None
+        entry['ai_pending'] = False
+        if not interpretation:
+            FORTUNE_UPGRADES.labels('failed').inc()
+            self._save()
+            return False
+
+        FORTUNE_UPGRADES.labels('upgraded').inc()
+        # Тот же генератор, что выбрал карту: шаблон AI текста выбирается так же, как в личном /fortune
+        rng = self.fortune_service.draw_rng(chat_id, entry['day'])
+        card = self.fortune_service.draw_random_card(rng)
+        entry['message'] = self.fortune_service.format_ai_fortune(card, interpretation, rng)
+        entry['ai_used'] = True
+        self._save()
+        return True
+
+    def pending_upgrade(self, chat_id: int) -> Optional[asyncio.Future]:
+        """Обновление карты чата AI толкованием, если оно ещё ожидается"""
+        upgrade = self._upgrades.get(chat_id)
+        # Отмена ожидающего обработчика не должна отменять общее обновление
+        return asyncio.shield(upgrade) if upgrade else None
+
+    def claim_post(self, chat_id: int) -> bool:
+        """Нужно ли публиковать карту в чате: True ровно один раз за день"""
+        entry = self._today(chat_id)
+        if entry is None or entry.get('posted'):
+            return False
+        entry['posted'] = True
+        return True
+
+    def release_post(self, chat_id: int):
+        """Публикация не удалась: следующий /fortune в чате опубликует карту снова"""
+        entry = self._today(chat_id)
+        if entry is not None:
+            entry['posted'] = False
+
+    def remember_message(self, chat_id: int, message_id: int):
+        """Запомнить сообщение с картой: следующие ответы в чате ссылаются на него"""
+        entry = self._today(chat_id)
+        if entry is not None:
+            entry['message_id'] = message_id
+            self._save()
+
+    def card_of(self, entry: Dict[str, Any]) -> TarotCard:
+        """Объект карты записи"""
+        return self.fortune_service.cards[entry['card_id']]
+
+    def format_card(self, entry: Dict[str, Any], chat_title: str) -> str:
+        """Сообщение с картой дня чата"""
+        if entry['ai_used']:
+            source_info = "🤖 AI толкование"
+        elif entry.get('ai_pending'):
+            source_info = "📚 Классическое толкование (🤖 AI толкование появится здесь, как только будет готово)"
+        else:
+            source_info = "📚 Классическое толкование"
+        return (
+            f"👥 **Карта дня для {chat_title}**\n\n"
+            f"{entry['message']}\n\n"
+            f"{source_info}\n"
+            f"🃏 Одна карта на весь чат до завтра. Личное предсказание - в личных сообщениях с ботом."
+        )
+
+    def format_reminder(self, entry: Dict[str, Any], user_name: str) -> str:
+        """Короткий ответ участнику, когда карта чата уже опубликована"""
+        return (
+            f"🃏 {user_name}, сегодня у чата одна карта на всех - **{self.card_of(entry).name}**.\n"
+            f"Толкование в сообщении с картой дня ⬆️"
+        )
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Сервис отправки изображений карт с кэшированием Telegram file_id
+"""
+
+import json
+import os
+import logging
+from typing import TYPE_CHECKING, Dict, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest
+
+from ..config import Config
+from ..models.card import TarotCard
+
+if TYPE_CHECKING:
+    from .render_service import RenderService
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def asset_fingerprint(path: str) -> str:
+    """Отпечаток файла изображения: размер и время изменения"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def find_card_image(images_dir: str, card_id: Optional[int]) -> Optional[str]:
+    """Найти файл изображения карты по её номеру в колоде"""
+    if card_id is None:
+        return None
+
+    for extension in IMAGE_EXTENSIONS:
+        path = os.path.join(images_dir, f"{card_id:02d}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class FileIdIndex:
+    """Индекс card_id -> Telegram file_id, сохраняемый в JSON файл"""
+
+    def __init__(self, filename: str):
+        """Инициализация индекса"""
+        self.filename = filename
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self._entries: Dict[str, Dict[str, str]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        """Загрузить индекс из файла"""
+        try:
+            if not os.path.exists(self.filename):
+                return {}
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки индекса file_id: {e}")
+            return {}
+
+    def _save(self):
+        """Сохранить индекс атомарно (через временный файл)"""
+        tmp_filename = f"{self.filename}.tmp"
+        try:
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, self.filename)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения индекса file_id: {e}")
+
+    def get(self, card_id: int, fingerprint: str) -> Optional[str]:
+        """Получить file_id, если изображение не менялось после загрузки"""
+        entry = self._entries.get(str(card_id))
+        if entry and entry.get('fingerprint') == fingerprint:
+            return entry.get('file_id')
+        return None
+
+    def put(self, card_id: int, fingerprint: str, file_id: str):
+        """Запомнить file_id загруженного изображения"""
+        self._entries[str(card_id)] = {'file_id': file_id, 'fingerprint': fingerprint}
+        self._save()
+
+    def invalidate(self, card_id: int):
+        """Забыть file_id карты (например, если Telegram его больше не принимает)"""
+        if self._entries.pop(str(card_id), None) is not None:
+            self._save()
+
+
+class ImageService:
+    """Сервис изображений карт: каждое изображение загружается в Telegram один раз"""
+
+    def __init__(self, config: Config, render_service: Optional['RenderService'] = None):
+        """Инициализация сервиса изображений"""
+        self.config = config
+        self.render_service = render_service
+        self.images_dir = config.card_images_dir
+        self.file_ids = FileIdIndex(config.file_id_index_file)
+        logger.info(f"🖼️ ImageService инициализирован: {self.images_dir}")
+
+    def image_path(self, card: TarotCard) -> Optional[str]:
+        """Найти файл изображения карты"""
+        return find_card_image(self.images_dir, card.card_id)
+
+    async def send_card_image(self, bot: Bot, chat_id: int, card: TarotCard, reader_name: Optional[str] = None) -> bool:
+        """Отправить изображение карты. Вернуть False если изображения нет."""
+        if self.render_service and reader_name:
+            return await self._send_rendered(bot, chat_id, card, reader_name)
+
+        path = self.image_path(card)
+        if not path:
+            return False
+
+        fingerprint = asset_fingerprint(path)
+        file_id = self.file_ids.get(card.card_id, fingerprint)
+
+        if file_id:
+            try:
+                await bot.send_photo(chat_id, photo=file_id, caption=str(card))
+                return True
+            except BadRequest as e:
+                logger.warning(f"⚠️ file_id карты {card.card_id} отклонён, загружаю заново: {e}")
+                self.file_ids.invalidate(card.card_id)
+
+        with open(path, 'rb') as f:
+            message = await bot.send_photo(chat_id, photo=f, caption=str(card))
+
+        if message.photo:
+            self.file_ids.put(card.card_id, fingerprint, message.photo[-1].file_id)
+            logger.info(f"🖼️ Изображение карты {card.card_id} загружено, file_id сохранён")
+        return True
+
+    async def _send_rendered(self, bot: Bot, chat_id: int, card: TarotCard, reader_name: str) -> bool:
+        """Отправить персональное изображение (уникально для читателя, file_id не кэшируется)"""
+        path = await self.render_service.render_card(card, reader_name)
+        with open(path, 'rb') as f:
+            await bot.send_photo(chat_id, photo=f, caption=str(card))
+        return True
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Таблицы лидеров: ограниченные top-K кучи, обновляемые при каждом сохранении пользователя
+"""
+
+import heapq
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Таблица -> поле пользователя. Оба значения только растут, поэтому куча из K лучших
+# никогда не теряет того, кто должен в неё попасть
+BOARDS = {
+    'fortunes': 'total_fortunes',
+    'streak': 'longest_streak',
+}
+
+
+class TopK:
+    """K наибольших значений: min-куча (значение, -user_id) и словарь участников.
+
+    При равных значениях выше стоит меньший user_id (как в top()), поэтому в вершине
+    кучи - последний в таблице, и новичок с тем же значением вытесняет только того,
+    кто окажется ниже него.
+
+    Пользователь с результатом не выше минимума отсекается за O(1); вставка - O(log K).
+    Рост результата участника перестраивает кучу за O(K), K мал (размер таблицы).
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: List[Tuple[int, int]] = []
+        self._scores: Dict[int, int] = {}
+
+    def offer(self, user_id: int, score: int) -> bool:
+        """Учесть результат пользователя. True, если таблица изменилась."""
+        if score <= 0 or self.size <= 0:
+            return False
+        known = self._scores.get(user_id)
+        if known is not None:
+            if score <= known:
+                return False
+            self._scores[user_id] = score
+            self._heap = [(value, -member) for member, value in self._scores.items()]
+            heapq.heapify(self._heap)
+            return True
+
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, (score, -user_id))
+        elif (score, -user_id) > self._heap[0]:
+            _, evicted = heapq.heapreplace(self._heap, (score, -user_id))
+            del self._scores[-evicted]
+        else:
+            return False
+        self._scores[user_id] = score
+        return True
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._scores
+
+    def top(self) -> List[Tuple[int, int]]:
+        """Участники по убыванию результата: [(user_id, значение)]"""
+        return sorted(self._scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def clear(self):
+        self._heap.clear()
+        self._scores.clear()
+
+
+class Leaderboard:
+    """Таблицы лидеров по BOARDS с сохранением в небольшой JSON файл.
+
+    Таблицы хранят и имена участников, поэтому /top отвечает без чтения базы.
+    Файл переписывается только когда таблица действительно изменилась.
+    """
+
+    def __init__(self, filename: str, size: int):
+        """Инициализация таблиц и загрузка с диска"""
+        self.filename = filename
+        self.size = size
+        self.boards = {board: TopK(size) for board in BOARDS}
+        self._names: Dict[int, str] = {}
+        self._load()
+
+    def _load(self):
+        """Прочитать таблицы с диска"""
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"❌ Ошибка чтения таблиц лидеров {self.filename}: {e}")
+            return
+
+        for board, entries in raw.get('boards', {}).items():
+            if board not in self.boards:
+                continue
+            for user_id, score in entries:
+                self.boards[board].offer(int(user_id), score)
+        self._names = {int(user_id): name for user_id, name in raw.get('names', {}).items()}
+
+    @property
+    def exists(self) -> bool:
+        """Сохранены ли таблицы на диске (иначе их нужно построить по базе)"""
+        return os.path.exists(self.filename)
+
+    def save(self):
+        """Записать таблицы атомарно: сначала во временный файл, затем заменить"""
+        # Имена вытесненных из всех таблиц больше не нужны
+        self._names = {
+            user_id: name for user_id, name in self._names.items()
+            if any(user_id in topk for topk in self.boards.values())
+        }
+        raw = {
+            'boards': {board: topk.top() for board, topk in self.boards.items()},
+            'names': self._names,
+        }
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.filename)
+
+    def _offer(self, user_id: int, first_name: Optional[str], values: Dict[str, Any]) -> bool:
+        """Учесть пользователя во всех таблицах без записи на диск"""
+        changed = False
+        for board, field in BOARDS.items():
+            changed |= self.boards[board].offer(user_id, values.get(field) or 0)
+        if first_name and self._names.get(user_id) != first_name:
+            # Имя хранится только для участников таблиц; смена имени участника тоже сохраняется
+            if changed or any(user_id in topk for topk in self.boards.values()):
+                self._names[user_id] = first_name
+                changed = True
+        return changed
+
+    def update(self, user: User):
+        """Учесть сохранённого пользователя; файл пишется, только если таблицы изменились"""
+        values = {field: getattr(user, field) for field in BOARDS.values()}
+        if self._offer(user.user_id, user.first_name, values):
+            self.save()
+
+    def rebuild(self, users: Iterable[Tuple[int, Dict[str, Any]]]):
+        """Построить таблицы по всем пользователям базы (один проход, O(N log K))"""
+        self.clear()
+        for user_id, data in users:
+            values = dict(data)
+            values.setdefault('longest_streak', 1 if data.get('last_fortune_date') else 0)
+            self._offer(user_id, data.get('first_name'), values)
+        self.save()
+
+    def top(self, board: str) -> List[Tuple[int, str, int]]:
+        """Таблица по убыванию: [(user_id, имя, значение)]"""
+        return [
+            (user_id, self._names.get(user_id) or "Аноним", score)
+            for user_id, score in self.boards[board].top()
+        ]
+
+    def clear(self):
+        """Очистить таблицы в памяти"""
+        for topk in self.boards.values():
+            topk.clear()
+        self._names.clear()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Сервис рендеринга персональных изображений карт в пуле процессов
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import os
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+# Pillow импортируется в рабочих процессах, а не при запуске бота
+PIL_AVAILABLE = importlib.util.find_spec('PIL') is not None
+
+from ..config import Config
+from ..models.card import TarotCard
+from .image_service import find_card_image
+
+logger = logging.getLogger(__name__)
+
+CARD_SIZE = (600, 1000)
+
+# Шаблоны оформления: цвета фона, панели и текста
+TEMPLATES = {
+    'daily': {
+        'background': (28, 18, 56),
+        'panel': (12, 8, 28),
+        'accent': (232, 200, 120),
+        'text': (245, 240, 255),
+    },
+}
+
+BASE_VARIANT = 'base'
+
+
+def _load_font(font_path: Optional[str], size: int):
+    """Загрузить шрифт; без TTF файла используется встроенный"""
+    from PIL import ImageFont
+
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size=size)
+
+
+def _draw_centered(draw, box_top: int, text: str, font, fill):
+    """Нарисовать строку по центру изображения"""
+    width = draw.textlength(text, font=font)
+    draw.text(((CARD_SIZE[0] - width) / 2, box_top), text, font=font, fill=fill)
+
+
+def render_base_layer(card_name: str, art_path: Optional[str], template: str,
+                      font_path: Optional[str], out_path: str) -> str:
+    """Нарисовать неперсональный слой: изображение карты и её название. Выполняется в рабочем процессе."""
+    from PIL import Image, ImageDraw
+
+    style = TEMPLATES[template]
+    image = Image.new('RGB', CARD_SIZE, style['background'])
+
+    if art_path:
+        with Image.open(art_path) as art:
+            art = art.convert('RGB')
+            art.thumbnail((CARD_SIZE[0], CARD_SIZE[1] - 160))
+            image.paste(art, ((CARD_SIZE[0] - art.width) // 2, 80))
+
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, CARD_SIZE[1] - 160, CARD_SIZE[0], CARD_SIZE[1]), fill=style['panel'])
+    draw.rectangle((8, 8, CARD_SIZE[0] - 8, CARD_SIZE[1] - 8), outline=style['accent'], width=3)
+    _draw_centered(draw, CARD_SIZE[1] - 120, card_name, _load_font(font_path, 44), style['accent'])
+
+    image.save(out_path, format='PNG')
+    return out_path
+
+
+def render_personal_layer(base_path: str, template: str, day: str, reader_name: str,
+                          font_path: Optional[str], out_path: str) -> str:
+    """Наложить дату и имя читателя на базовый слой. Выполняется в рабочем процессе."""
+    from PIL import Image, ImageDraw
+
+    style = TEMPLATES[template]
+    with Image.open(base_path) as base:
+        image = base.convert('RGB')
+
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((8, 8, CARD_SIZE[0] - 8, 72), fill=style['panel'])
+    _draw_centered(draw, 22, f"{reader_name} · {day}", _load_font(font_path, 30), style['text'])
+
+    image.save(out_path, format='JPEG', quality=88)
+    return out_path
+
+
+class RenderCache:
+    """LRU кэш отрендеренных изображений на диске с ключом (карта, шаблон, вариант)"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """Инициализация кэша: подхватить файлы, оставшиеся с прошлого запуска"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Имя файла -> размер; порядок от давно использованных к недавним
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        files = []
+        for filename in os.listdir(directory):
+            if filename.startswith(f"{BASE_VARIANT}-") or filename.endswith('.tmp'):
+                continue
+            stat = os.stat(os.path.join(directory, filename))
+            files.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(files):
+            self._entries[filename] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def filename(card_id: int, template: str, variant: str) -> str:
+        """Имя файла для ключа. Базовые слои не участвуют в вытеснении."""
+        if variant == BASE_VARIANT:
+            return f"{BASE_VARIANT}-{template}-{card_id:02d}.png"
+        digest = hashlib.sha1(f"{card_id}|{template}|{variant}".encode('utf-8')).hexdigest()
+        return f"{digest}.jpg"
+
+    def path(self, filename: str) -> str:
+        """Полный путь к файлу кэша"""
+        return os.path.join(self.directory, filename)
+
+    def get(self, filename: str) -> Optional[str]:
+        """Вернуть путь к готовому изображению и отметить его как недавно использованное"""
+        path = self.path(filename)
+        if filename in self._entries:
+            self._entries.move_to_end(filename)
+            return path
+        if filename.startswith(f"{BASE_VARIANT}-") and os.path.exists(path):
+            return path
+        return None
+
+    def put(self, filename: str):
+        """Учесть новый файл и вытеснить самые старые, если превышен лимит"""
+        if filename.startswith(f"{BASE_VARIANT}-"):
+            return
+
+        size = os.path.getsize(self.path(filename))
+        self._total_bytes += size - self._entries.pop(filename, 0)
+        self._entries[filename] = size
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            old_filename, old_size = self._entries.popitem(last=False)
+            self._total_bytes -= old_size
+            try:
+                os.remove(self.path(old_filename))
+            except OSError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        """Суммарный размер персональных изображений в кэше"""
+        return self._total_bytes
+
+
+class RenderService:
+    """Рендеринг изображений карт в ProcessPoolExecutor, чтобы не блокировать event loop"""
+
+    def __init__(self, config: Config, cards: Sequence[TarotCard], template: str = 'daily'):
+        """Инициализация сервиса рендеринга"""
+        self.config = config
+        self.cards = list(cards)
+        self.template = template
+        self.cache = RenderCache(config.render_cache_dir, config.render_cache_mb * 1024 * 1024)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Ключ -> задача рендеринга, чтобы одинаковые запросы не рендерились дважды
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def available(self) -> bool:
+        """Доступен ли рендеринг (установлен Pillow)"""
+        return PIL_AVAILABLE
+
+    async def start(self):
+        """Запустить пул процессов и отрендерить базовые слои всех карт"""
+        workers = self.config.render_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        logger.info(f"🎨 RenderService запущен ({workers} процессов)")
+
+        # Базовые слои перерисовываются при каждом запуске, чтобы подхватить новые изображения карт
+        results = await asyncio.gather(
+            *(self._base_layer(card, refresh=True) for card in self.cards),
+            return_exceptions=True
+        )
+        for card, result in zip(self.cards, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Ошибка рендеринга базового слоя {card.name}: {result}")
+        logger.info(f"🎨 Базовые слои готовы для {len(self.cards)} карт")
+
+    async def shutdown(self):
+        """Остановить пул процессов"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render_card(self, card: TarotCard, reader_name: str, day: Optional[str] = None) -> str:
+        """Получить путь к персональному изображению карты (из кэша или после рендеринга)"""
+        day = day or date.today().strftime('%d.%m.%Y')
+        filename = RenderCache.filename(card.card_id, self.template, f"{day}|{reader_name}")
+
+        cached = self.cache.get(filename)
+        if cached:
+            return cached
+
+        base_path = await self._base_layer(card)
+        return await self._run_once(
+            filename, render_personal_layer,
+            base_path, self.template, day, reader_name, self.config.render_font, self.cache.path(filename)
+        )
+
+    async def _base_layer(self, card: TarotCard, refresh: bool = False) -> str:
+        """Получить путь к базовому слою карты"""
+        filename = RenderCache.filename(card.card_id, self.template, BASE_VARIANT)
+        cached = None if refresh else self.cache.get(filename)
+        if cached:
+            return cached
+
+        art_path = find_card_image(self.config.card_images_dir, card.card_id)
+        return await self._run_once(
+            filename, render_base_layer,
+            card.name, art_path, self.template, self.config.render_font, self.cache.path(filename)
+        )
+
+    async def _run_once(self, filename: str, func, *args) -> str:
+        """Выполнить рендеринг в пуле процессов; параллельные запросы одного ключа ждут одну задачу"""
+        future = self._in_flight.get(filename)
+        if future is None:
+            future = asyncio.ensure_future(self._render(filename, func, *args))
+            self._in_flight[filename] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(filename, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, filename: str, func, *args) -> str:
+        """Запустить функцию рендеринга в рабочем процессе"""
+        if self._executor is None:
+            raise RuntimeError("RenderService не запущен")
+
+        # Запись во временный файл, чтобы кэш не увидел недописанное изображение
+        out_path = args[-1]
+        tmp_path = f"{out_path}.tmp"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, func, *args[:-1], tmp_path)
+        os.replace(tmp_path, out_path)
+
+        self.cache.put(filename)
+        return out_path
+
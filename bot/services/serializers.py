@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Форматы файла базы пользователей: JSON (с отступами и компактный), быстрый JSON, бинарный msgpack
+"""
+
+import importlib.util
+import json
+import logging
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Необязательные ускорители: используются, только если установлены
+ORJSON_AVAILABLE = importlib.util.find_spec('orjson') is not None
+MSGSPEC_AVAILABLE = importlib.util.find_spec('msgspec') is not None
+MSGPACK_AVAILABLE = importlib.util.find_spec('msgpack') is not None
+
+# Бинарный формат: сигнатура и версия схемы перед телом msgpack
+BINARY_MAGIC = b'TRDB'
+BINARY_HEADER = struct.Struct('<4sH')
+BINARY_VERSION = 1
+
+
+class Serializer(ABC):
+    """Кодирование всей базы (словарь user_id -> данные) в байты и обратно"""
+
+    name = ''
+    # Формат на диске: файлы с одинаковым форматом читаются любым сериализатором этого формата
+    disk_format = 'json'
+    # Расширение для копий файла (бэкапов), соответствующее формату на диске
+    extension = '.json'
+
+    @abstractmethod
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        """Закодировать базу"""
+
+    @abstractmethod
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        """Раскодировать базу"""
+
+
+class PrettyJSONSerializer(Serializer):
+    """JSON с отступами - прежний формат, удобный для чтения глазами"""
+
+    name = 'json'
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return json.loads(raw)
+
+
+class CompactJSONSerializer(PrettyJSONSerializer):
+    """JSON без пробелов: тот же формат, файл на пятую часть меньше, запись вдвое быстрее"""
+
+    name = 'compact'
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonSerializer(Serializer):
+    """Компактный JSON через orjson (pip install orjson)"""
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return self._orjson.dumps(data)
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return self._orjson.loads(raw)
+
+
+class MsgspecSerializer(Serializer):
+    """Компактный JSON через msgspec (pip install msgspec)"""
+
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return self._encoder.encode(data)
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return self._decoder.decode(raw)
+
+
+class BinarySerializer(Serializer):
+    """msgpack с заголовком TRDB + версия схемы (pip install msgpack)"""
+
+    name = 'binary'
+    disk_format = 'binary'
+    extension = '.msgpack'
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION) + self._msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        magic, version = BINARY_HEADER.unpack_from(raw)
+        if magic != BINARY_MAGIC:
+            raise ValueError("не бинарный файл базы")
+        if version > BINARY_VERSION:
+            raise ValueError(f"версия схемы {version} новее поддерживаемой {BINARY_VERSION}")
+        return self._msgpack.unpackb(raw[BINARY_HEADER.size:], raw=False, strict_map_key=False)
+
+
+def detect_format(raw: bytes) -> Optional[str]:
+    """Формат содержимого файла: 'json', 'binary' или None для пустого файла"""
+    if raw.startswith(BINARY_MAGIC):
+        return 'binary'
+    # isspace() останавливается на первом непробельном байте, в отличие от strip() не копирует файл
+    if raw and not raw.isspace():
+        return 'json'
+    return None
+
+
+def get_serializer(name: str) -> Serializer:
+    """Сериализатор по имени из STORAGE_FORMAT.
+
+    fast - самый быстрый из установленных JSON (orjson, msgspec, иначе компактный stdlib).
+    Если для формата не установлена библиотека, используется компактный JSON.
+    """
+    name = (name or 'json').strip().lower()
+    if name == 'json':
+        return PrettyJSONSerializer()
+    if name == 'fast':
+        if ORJSON_AVAILABLE:
+            return OrjsonSerializer()
+        if MSGSPEC_AVAILABLE:
+            return MsgspecSerializer()
+        return CompactJSONSerializer()
+
+    optional = {
+        'orjson': (ORJSON_AVAILABLE, OrjsonSerializer),
+        'msgspec': (MSGSPEC_AVAILABLE, MsgspecSerializer),
+        'binary': (MSGPACK_AVAILABLE, BinarySerializer),
+    }
+    if name in optional:
+        available, factory = optional[name]
+        if available:
+            return factory()
+        logger.warning(f"⚠️ STORAGE_FORMAT={name}: библиотека не установлена - используется компактный JSON")
+    elif name != 'compact':
+        logger.warning(f"⚠️ Неизвестный STORAGE_FORMAT={name} - используется компактный JSON")
+    return CompactJSONSerializer()
+
+
+def reader_for(disk_format: str, preferred: Serializer) -> Serializer:
+    """Сериализатор для чтения файла в формате disk_format (для миграции из другого формата)"""
+    if disk_format == preferred.disk_format:
+        return preferred
+    if disk_format == 'binary':
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("файл базы в бинарном формате, а msgpack не установлен")
+        return BinarySerializer()
+    return PrettyJSONSerializer()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Сервис раскладов из нескольких карт (три карты, Кельтский крест)
+"""
+
+import logging
+import random
+from typing import Dict, List, Optional, Tuple
+
+from ..config import Config
+from ..models.spread import Spread, SpreadCard
+from .ai_service import AIService
+from .fortune_service import FortuneService
+from .user_service import UserService
+from ..utils.metrics import SPREAD_READINGS
+from ..utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Вид расклада -> (название, позиции)
+SPREADS: Dict[str, Tuple[str, List[str]]] = {
+    'three': ("Прошлое, настоящее, будущее", ["Прошлое", "Настоящее", "Будущее"]),
+    'celtic': ("Кельтский крест", [
+        "Суть ситуации",
+        "Препятствие",
+        "Основа",
+        "Прошлое",
+        "Сознательная цель",
+        "Ближайшее будущее",
+        "Вы сами",
+        "Окружение",
+        "Надежды и опасения",
+        "Итог",
+    ]),
+}
+
+# Названия видов в команде /spread
+SPREAD_ALIASES = {
+    'three': 'three', 'три': 'three', '3': 'three',
+    'celtic': 'celtic', 'кельтский': 'celtic', 'крест': 'celtic', '10': 'celtic',
+}
+
+REVERSED_NOTE = "В перевёрнутом положении энергия карты ослаблена или обращена внутрь."
+
+
+class SpreadService:
+    """Сервис раскладов: вытягивание карт и толкование всех позиций одним AI запросом"""
+
+    def __init__(self, config: Config, fortune_service: FortuneService,
+                 ai_service: AIService, user_service: UserService):
+        """Инициализация сервиса раскладов"""
+        self.config = config
+        self.fortune_service = fortune_service
+        self.ai_service = ai_service
+        self.user_service = user_service
+        logger.info("🃏 SpreadService инициализирован")
+
+    @staticmethod
+    def resolve_kind(name: Optional[str]) -> Optional[str]:
+        """Вид расклада по аргументу команды (по умолчанию - три карты)"""
+        if not name:
+            return 'three'
+        return SPREAD_ALIASES.get(name.lower())
+
+    def draw_spread(self, kind: str, rng: Optional[random.Random] = None) -> Spread:
+        """Вытянуть карты расклада без возвращения в колоду"""
+        rng = rng or random
+        title, positions = SPREADS[kind]
+        cards = rng.sample(self.fortune_service.cards, len(positions))
+        return Spread(kind=kind, title=title, cards=[
+            SpreadCard(
+                position=position,
+                card=card,
+                reversed=self.config.spread_reversals and rng.random() < 0.5,
+            )
+            for position, card in zip(positions, cards)
+        ])
+
+    @traced('spread.interpret')
+    async def interpret(self, spread: Spread, user_name: Optional[str] = None, use_ai: bool = True) -> Spread:
+        """Заполнить толкования позиций: один AI запрос на весь расклад, классика - для остальных"""
+        interpretations = {}
+        if use_ai and self.ai_service.ai_available:
+            interpretations = await self.ai_service.generate_spread_interpretation(
+                [(item.position, item.card.name, item.reversed) for item in spread.cards],
+                user_name
+            )
+
+        for index, item in enumerate(spread.cards, start=1):
+            if index in interpretations:
+                item.interpretation = interpretations[index]
+                item.ai_used = True
+            else:
+                item.interpretation = f"{item.card.meaning} {REVERSED_NOTE}" if item.reversed else item.card.meaning
+
+        SPREAD_READINGS.labels(spread.kind).inc()
+        return spread
+
+    @traced('spread.get_spread')
+    async def get_spread(self, kind: str, user_id: int, first_name: Optional[str] = None) -> Spread:
+        """Вытянуть и истолковать расклад для пользователя"""
+        user = self.user_service.get_user(user_id, first_name)
+        spread = self.draw_spread(kind)
+        return await self.interpret(spread, first_name, use_ai=user.use_ai)
+
+    def format_spread(self, user_name: str, spread: Spread) -> str:
+        """Форматировать расклад для отправки"""
+        parts = [f"🃏 {user_name}, ваш расклад «{spread.title}»"]
+        for index, item in enumerate(spread.cards, start=1):
+            parts.append(
+                f"**{index}. {item.position}** - {item.card.get_type_emoji()} {item.title}\n"
+                f"{item.interpretation}"
+            )
+
+        if spread.ai_positions == len(spread.cards):
+            parts.append("🤖 Персональное AI толкование")
+        elif spread.ai_positions:
+            parts.append("🤖 AI толкование (часть позиций - 📚 классическое)")
+        else:
+            parts.append("📚 Классическое толкование")
+        return "\n\n".join(parts)
@@ -4,58 +4,211 @@
 """
 
 import logging
-from typing import Optional, Dict, Any
-from datetime import date
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import AsyncIterator, Optional, Dict, Any, Set, Tuple
+from datetime import date, timedelta
 
 from ..config import Config
 from ..models.user import User
+from .cold_storage import ColdStorage
 from .database import Database
+from .leaderboard import Leaderboard
+from .serializers import get_serializer
+from ..utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+
+class UserConflictError(Exception):
+    """Пользователь изменён другой операцией между чтением и записью транзакции"""
+
+
 class UserService:
     """Сервис для работы с пользователями"""
     
     def __init__(self, config: Config):
         """Инициализация сервиса пользователей"""
         self.config = config
-        self.db = Database(config.user_data_file)
+        self.db = Database(config.user_data_file, get_serializer(config.storage_format))
+        # Identity map: один живой объект User на активного пользователя, вытеснение по LRU.
+        # Запись сквозная (каждое изменение сразу сохраняется), поэтому кэш всегда совпадает с базой.
+        # Изменения сохраняются одной записью на команду; версия растёт с каждой записью.
+        self._users: 'OrderedDict[int, User]' = OrderedDict()
+        # Холодный архив: давно не заходившие пользователи вынесены из основной базы
+        self.cold = ColdStorage(config.cold_storage_dir)
+        # Таблицы лидеров обновляются при каждом сохранении; без файла строятся по базе один раз
+        self.leaderboard = Leaderboard(config.leaderboard_file, config.leaderboard_size)
+        if not self.leaderboard.exists:
+            self._rebuild_leaderboard()
+        # Кто уже получил сегодня ответ в групповом чате: (чат, пользователь); только в памяти
+        self._daily_day = 0
+        self._daily_seen: Set[Tuple[int, int]] = set()
+        # Последняя активность (любое обновление): user_id -> день. Только в памяти; в last_seen
+        # попадает при следующем сохранении пользователя, архивация учитывает её и без записи
+        self._activity: Dict[int, str] = {}
         logger.info("👥 UserService инициализирован")
     
+    @traced('users.get_user')
     def get_user(self, user_id: int, first_name: Optional[str] = None) -> User:
         """Получить пользователя или создать нового"""
-        user_data = self.db.get_user_data(user_id)
-        
-        if user_data:
-            user = User.from_dict(user_id, user_data)
+        user = self._peek(user_id)
+        if user is None:
+            user = self._new_user(user_id, first_name)
+            self._save_user(user)
+            logger.info("👤 Новый пользователь создан: %s", user_id, extra={'user_id': user_id})
+        elif first_name and user.first_name != first_name:
             # Обновить имя если изменилось
-            if first_name and user.first_name != first_name:
-                user.first_name = first_name
-                self._save_user(user)
-        else:
-            # Создать нового пользователя
-            user = User(
-                user_id=user_id,
-                first_name=first_name,
-                created_at=date.today().isoformat()
-            )
+            user.first_name = first_name
             self._save_user(user)
-            logger.info(f"👤 Новый пользователь создан: {user_id}")
         
         return user
     
+    def _peek(self, user_id: int) -> Optional[User]:
+        """Пользователь из identity map или из базы (без создания)"""
+        user = self._users.get(user_id)
+        if user is not None:
+            self._users.move_to_end(user_id)
+            return user
+        
+        user_data = self.db.get_user_data(user_id)
+        if not user_data and user_id in self.cold:
+            user_data = self._rehydrate(user_id)
+        if not user_data:
+            return None
+        user = User.from_dict(user_id, user_data)
+        self._remember(user)
+        return user
+    
+    def _rehydrate(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Данные пользователя из архива (версия сохраняется).
+        
+        Без записи: пользователь возвращается в identity map, а в основную базу
+        его переносит следующее сохранение (_save_user), поэтому команда по-прежнему
+        стоит одну запись, а команды только для чтения не пишут вовсе.
+        """
+        user_data = self.cold.restore(user_id)
+        if user_data:
+            logger.info("🔥 Пользователь %s возвращён из архива", user_id, extra={'user_id': user_id})
+        return user_data
+    
+    @staticmethod
+    def _new_user(user_id: int, first_name: Optional[str]) -> User:
+        """Новый пользователь (ещё не сохранён)"""
+        return User(
+            user_id=user_id,
+            first_name=first_name,
+            created_at=date.today().isoformat()
+        )
+    
+    def _remember(self, user: User):
+        """Положить пользователя в identity map, вытеснив самых давних"""
+        self._users[user.user_id] = user
+        while len(self._users) > self.config.user_cache_size:
+            self._users.popitem(last=False)
+    
     def _save_user(self, user: User):
-        """Сохранить пользователя"""
+        """Сохранить пользователя. Каждая запись увеличивает версию."""
+        user.version += 1
+        seen = self._activity.get(user.user_id)
+        if seen and (user.last_seen or '') < seen:
+            user.last_seen = seen
         self.db.save_user_data(user.user_id, user.to_dict())
+        if user.user_id in self.cold:
+            # Сначала запись в основную базу, затем удаление из индекса: сбой между ними оставит
+            # копию в архиве, но основная база при чтении имеет приоритет
+            self.cold.forget(user.user_id)
+        self._remember(user)
+        self.leaderboard.update(user)
+    
+    def _rebuild_leaderboard(self):
+        """Построить таблицы лидеров по основной базе и архиву"""
+        users = [(int(user_id), data) for user_id, data in self.db.load_all_data().items()]
+        if not users and not len(self.cold):
+            return
+        # Архив хранит в индексе только число предсказаний; серии архивных пользователей не учитываются
+        archived = [(user_id, {'total_fortunes': fortunes}) for user_id, fortunes in self.cold.members()]
+        self.leaderboard.rebuild(users + archived)
+        logger.info(f"🏆 Таблицы лидеров построены по {len(users) + len(archived)} пользователям")
+    
+    def _modify(self, user_id: int, first_name: Optional[str]) -> User:
+        """Пользователь для изменения с одной записью: новый создаётся без отдельного сохранения"""
+        user = self._peek(user_id) or self._new_user(user_id, first_name)
+        if first_name:
+            user.first_name = first_name
+        return user
     
+    @asynccontextmanager
+    async def transaction(self, user_id: int, first_name: Optional[str] = None) -> AsyncIterator[User]:
+        """Изменение пользователя одной записью: async with users.transaction(user_id) as user.
+        
+        Внутри блока изменяется копия пользователя. При выходе изменённые поля
+        переносятся в живой объект и сохраняются одной записью; если за время блока
+        пользователя уже сохранил кто-то другой, поднимается UserConflictError
+        и ничего не записывается. Исключение внутри блока отменяет изменения.
+        """
+        current = self._peek(user_id)
+        working = replace(current) if current else self._new_user(user_id, first_name)
+        snapshot = current.to_dict() if current else {}
+        if first_name and working.first_name != first_name:
+            working.first_name = first_name
+        
+        yield working
+        
+        changes = {
+            field: value for field, value in working.to_dict().items()
+            if field != 'version' and snapshot.get(field) != value
+        }
+        if not changes:
+            return
+        
+        latest = self._peek(user_id)
+        if (latest.version if latest else 0) != working.version:
+            raise UserConflictError(f"пользователь {user_id} изменён параллельно")
+        
+        if latest is None:
+            latest = working
+        else:
+            for field, value in changes.items():
+                setattr(latest, field, value)
+        self._save_user(latest)
+        working.version = latest.version
+    
+    @traced('users.record_fortune')
     def record_fortune(self, user_id: int, first_name: Optional[str] = None) -> Dict[str, Any]:
         """Обновить дату предсказания и вернуть статистику за одну операцию"""
-        user = self.get_user(user_id, first_name)
+        user = self._modify(user_id, first_name)
         user.update_fortune_date()
         self._save_user(user)
-        logger.info(f"🔮 Пользователь {user_id} получил предсказание")
+        logger.info("🔮 Пользователь %s получил предсказание", user_id, extra={'user_id': user_id})
         return self.user_stats(user)
 
+    def touch(self, user_id: int):
+        """Отметить активность пользователя сегодня (без записи в базу)"""
+        self._activity[user_id] = date.today().isoformat()
+    
+    def claim_daily(self, user_id: int, scope: int) -> bool:
+        """Отметить ответ пользователю в scope (групповой чат) сегодня. True - впервые за день.
+        
+        Без записи в базу: отметки сбрасываются со сменой дня, после перезапуска
+        пользователь может один раз получить ответ повторно.
+        """
+        day = date.today().toordinal()
+        if day != self._daily_day:
+            self._daily_day = day
+            self._daily_seen.clear()
+        key = (scope, user_id)
+        if key in self._daily_seen:
+            return False
+        self._daily_seen.add(key)
+        return True
+
+    def release_daily(self, user_id: int, scope: int):
+        """Снять отметку claim_daily: ответ не удалось отправить, повтор должен сработать"""
+        self._daily_seen.discard((scope, user_id))
+
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """Получить статистику пользователя"""
         user = self.get_user(user_id)
@@ -68,15 +221,18 @@ class UserService:
             'total_fortunes': user.total_fortunes,
             'last_fortune_date': user.last_fortune_date,
             'created_at': user.created_at,
-            'can_get_today': user.can_get_fortune_today
+            'can_get_today': user.can_get_fortune_today,
+            'current_streak': user.active_streak,
+            'longest_streak': user.longest_streak,
+            'achievements': user.achievements
         }
     
     def get_all_stats(self) -> Dict[str, Any]:
         """Получить общую статистику всех пользователей"""
         all_data = self.db.load_all_data()
         
-        total_users = len(all_data)
-        total_fortunes = sum(data.get('total_fortunes', 0) for data in all_data.values())
+        total_users = len(all_data) + len(self.cold)
+        total_fortunes = self.cold.total_fortunes + sum(data.get('total_fortunes', 0) for data in all_data.values())
         
         # Пользователи сегодня
         today = date.today().isoformat()
@@ -89,13 +245,49 @@ class UserService:
             'total_users': total_users,
             'total_fortunes': total_fortunes,
             'users_today': users_today,
+            'archived_users': len(self.cold),
             'database_file': self.config.user_data_file
         }
     
+    def _last_active(self, user_id: str, data: Dict[str, Any]) -> str:
+        """Дата последней активности: любое обновление (в памяти или last_seen), предсказание или регистрация"""
+        return max(
+            self._activity.get(int(user_id), ''), data.get('last_seen') or '',
+            data.get('last_fortune_date') or '', data.get('created_at') or ''
+        )
+    
+    @traced('users.archive_inactive')
+    def archive_inactive(self, days: int) -> Dict[str, Any]:
+        """Перенести в архив пользователей, неактивных дольше days дней"""
+        cutoff = (date.today() - timedelta(days=days)).isoformat()
+        all_data = self.db.load_all_data()
+        inactive = {
+            user_id: data for user_id, data in all_data.items()
+            if self._last_active(user_id, data) < cutoff
+        }
+        # Давние отметки активности больше ничего не решают
+        self._activity = {user_id: day for user_id, day in self._activity.items() if day >= cutoff}
+        if not inactive:
+            return {'archived': 0, 'hot_users': len(all_data), 'cold_users': len(self.cold)}
+        
+        # Сегмент пишется до удаления из основной базы: при сбое пользователь окажется в обеих
+        segment = self.cold.archive(inactive)
+        for user_id in inactive:
+            del all_data[user_id]
+            self._users.pop(int(user_id), None)
+        self.db.save_all_data(all_data)
+        
+        logger.info(f"🧊 В архив {segment} перенесено {len(inactive)} пользователей (неактивны с {cutoff})")
+        return {'archived': len(inactive), 'hot_users': len(all_data), 'cold_users': len(self.cold)}
+    
     def reset_database(self) -> Dict[str, str]:
         """Сбросить базу данных (создать бэкап)"""
         try:
             backup_file = self.db.reset_with_backup()
+            self.cold.reset_with_backup(os.path.join(os.path.dirname(self.config.user_data_file), 'backups'))
+            self._users.clear()
+            self.leaderboard.clear()
+            self.leaderboard.save()
             logger.warning(f"🗑️ База данных сброшена, бэкап: {backup_file}")
             return {
                 'status': 'success',
@@ -109,9 +301,16 @@ class UserService:
                 'message': f'Ошибка сброса: {e}'
             }
     
+    def mark_ai_reading(self, user_id: int):
+        """Отметить, что сегодняшнее предсказание пользователя заменено AI версией"""
+        user = self._peek(user_id)
+        if user is not None and not user.ai_reading:
+            user.ai_reading = True
+            self._save_user(user)
+    
     def toggle_ai(self, user_id: int, first_name: Optional[str] = None) -> bool:
         """Переключить AI режим для пользователя. Возвращает новое значение."""
-        user = self.get_user(user_id, first_name)
+        user = self._modify(user_id, first_name)
         user.use_ai = not user.use_ai
         self._save_user(user)
         return user.use_ai
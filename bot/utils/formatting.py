@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Подготовка текста сообщений: Markdown бота -> HTML Telegram с проверкой длины
+
+Тексты бота пишутся в привычной разметке (**жирный**, *жирный*, _курсив_, `код`,
+```блок```). render_message() переводит их в HTML локально: парные маркеры становятся
+тегами, непарные остаются обычными символами, всё остальное экранируется. Поэтому
+Telegram всегда принимает разметку с первого раза и повторная отправка без неё не нужна.
+"""
+
+import html
+import logging
+import re
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Telegram на длину текста сообщения (в UTF-16 символах после разбора разметки)
+MESSAGE_LIMIT = 4096
+
+# Символы разметки, которые экранируются обратной косой чертой
+_MARKUP_CHARS = re.compile(r'([\\*_`])')
+_ESCAPED_CHAR = re.compile(r'\\([\\*_`\[\]])')
+
+_PRE = re.compile(r'```(?:([\w+-]+)\n)?\n?(.*?)```', re.DOTALL)
+_CODE = re.compile(r'`([^`\n]+)`')
+_BOLD = re.compile(r'\*\*(?=\S)([^<>\n]*?[^\s<>])\*\*')
+_STAR = re.compile(r'(?<![*\w])\*(?=[^\s*])([^<>\n*]*?[^\s<>*])\*(?![*\w])')
+_ITALIC = re.compile(r'(?<![_\w])_(?=[^\s_])([^<>\n_]*?[^\s<>_])_(?![_\w])')
+_TAG = re.compile(r'<[^>]+>')
+
+# Метки-заменители для кода и экранированных символов (символы из области частного использования)
+_SLOT_OPEN, _SLOT_CLOSE = '\ue000', '\ue001'
+_SLOT = re.compile(f'{_SLOT_OPEN}(\\d+){_SLOT_CLOSE}')
+
+
+def escape_markdown(text: str) -> str:
+    """Экранировать разметку во вставляемом тексте (имя пользователя, ответ AI)"""
+    return _MARKUP_CHARS.sub(r'\\\1', text)
+
+
+def sanitize_ai_text(text: str) -> str:
+    """Привести ответ AI к разметке бота: парные выделения остаются, одиночные * и ` экранируются"""
+    text = re.sub(r'^#+\s*', '', text.strip(), flags=re.MULTILINE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    pairs: List[str] = []
+
+    def keep(match: re.Match) -> str:
+        pairs.append(match.group(0))
+        return f"{_SLOT_OPEN}{len(pairs) - 1}{_SLOT_CLOSE}"
+
+    text = text.replace(_SLOT_OPEN, '').replace(_SLOT_CLOSE, '')
+    for pattern in (_BOLD, _STAR, _ITALIC):
+        text = pattern.sub(keep, text)
+    text = escape_markdown(text)
+    return _SLOT.sub(lambda m: pairs[int(m.group(1))], text)
+
+
+def markdown_to_html(text: str) -> str:
+    """Перевести разметку бота в HTML Telegram"""
+    slots: List[str] = []
+
+    def keep(fragment: str) -> str:
+        slots.append(fragment)
+        return f"{_SLOT_OPEN}{len(slots) - 1}{_SLOT_CLOSE}"
+
+    text = text.replace(_SLOT_OPEN, '').replace(_SLOT_CLOSE, '')
+    text = _ESCAPED_CHAR.sub(lambda m: keep(html.escape(m.group(1), quote=False)), text)
+    text = _PRE.sub(lambda m: keep(f"<pre>{html.escape(m.group(2).rstrip(), quote=False)}</pre>"), text)
+    text = _CODE.sub(lambda m: keep(f"<code>{html.escape(m.group(1), quote=False)}</code>"), text)
+
+    text = html.escape(text, quote=False)
+    text = _BOLD.sub(r'<b>\1</b>', text)
+    text = _STAR.sub(r'<b>\1</b>', text)
+    text = _ITALIC.sub(r'<i>\1</i>', text)
+
+    return _SLOT.sub(lambda m: slots[int(m.group(1))], text)
+
+
+def visible_length(html_text: str) -> int:
+    """Длина сообщения так, как её считает Telegram: без тегов, в UTF-16 символах"""
+    plain = html.unescape(_TAG.sub('', html_text))
+    return len(plain.encode('utf-16-le')) // 2
+
+
+def render_message(text: str, limit: int = MESSAGE_LIMIT) -> str:
+    """HTML для parse_mode=HTML; слишком длинный текст обрезается по абзацам"""
+    rendered = markdown_to_html(text)
+    if visible_length(rendered) <= limit:
+        return rendered
+
+    logger.warning("⚠️ Сообщение длиннее %d символов обрезано", limit)
+    paragraphs = text.split('\n\n')
+    while len(paragraphs) > 1:
+        paragraphs.pop()
+        rendered = markdown_to_html('\n\n'.join(paragraphs) + '\n\n…')
+        if visible_length(rendered) <= limit:
+            return rendered
+
+    # Один длинный абзац: видимый текст не длиннее исходного, поэтому достаточно обрезать исходный
+    head = paragraphs[0]
+    while len(head.encode('utf-16-le')) // 2 > limit - 1:
+        head = head[:-max(1, (len(head.encode('utf-16-le')) // 2 - limit + 1) // 2)]
+    return markdown_to_html(head + '…')
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Разбить длинный текст на части по границам абзацев (каждую часть затем рендерит render_message)"""
+    parts, current = [], ""
+    for paragraph in text.split("\n\n"):
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if visible_length(markdown_to_html(candidate)) <= limit:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        current = paragraph
+    if current:
+        parts.append(current)
+    return parts
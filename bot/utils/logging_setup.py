@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Настройка логирования: запись из фонового потока, JSON формат и выборка
+"""
+
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+PLAIN_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Поля из extra=..., которые попадают в JSON запись
+STRUCTURED_FIELDS = ('user_id', 'command', 'latency_ms', 'update_id', 'chat_id')
+
+# Логгер строк доступа: одна запись на обработанное обновление
+ACCESS_LOGGER = 'bot.access'
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON строка на запись лога"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускать только долю INFO/DEBUG записей; предупреждения и ошибки проходят всегда"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Более длинные префиксы проверяются первыми
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix, prefix_rate in self.rates:
+                if name == prefix or name.startswith(prefix + '.'):
+                    rate = prefix_rate
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует сообщение в потоке event loop.
+
+    Стандартный QueueHandler.prepare() подставляет аргументы в сообщение до постановки
+    в очередь. Здесь запись передаётся как есть, и форматирование выполняет поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[str, float]:
+    """Разобрать строку вида 'bot.access=0.1,bot.handlers.stats=0.5'"""
+    rates = {}
+    for part in (spec or '').split(','):
+        name, _, value = part.partition('=')
+        if not name.strip() or not value:
+            continue
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def setup_logging(mode: str = 'plain', level: str = 'INFO', sample: Optional[str] = None) -> Optional[QueueListener]:
+    """Настроить логирование.
+
+    plain - синхронная запись в stderr (как раньше);
+    async - тот же текстовый формат, но запись из фонового потока;
+    json  - запись из фонового потока, одна JSON строка на запись.
+
+    Возвращает QueueListener, который нужно остановить при завершении (для async/json).
+    """
+    mode = (mode or 'plain').lower()
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, (level or 'INFO').upper(), logging.INFO))
+
+    if mode not in ('async', 'json'):
+        logging.basicConfig(format=PLAIN_FORMAT, level=root.level)
+        # Строки доступа нужны для структурированных логов, в текстовом режиме они лишние
+        logging.getLogger(ACCESS_LOGGER).setLevel(logging.WARNING)
+        return None
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if mode == 'json' else logging.Formatter(PLAIN_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    rates = parse_sample_rates(sample)
+    if rates:
+        # Фильтр до очереди: отброшенные записи не форматируются вовсе
+        queue_handler.addFilter(SamplingFilter(rates))
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
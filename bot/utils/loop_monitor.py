@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Контроль задержек event loop: heartbeat задача и сторожевой поток со снимком стека
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .metrics import LOOP_LAG, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+# Период heartbeat (секунды): задержка пробуждения после sleep и есть задержка event loop
+HEARTBEAT_INTERVAL = 0.25
+
+# Сколько последних кадров стека писать в лог
+STACK_DEPTH = 15
+
+
+class LoopMonitor:
+    """Замер задержки планирования event loop и поиск блокирующего кода.
+
+    Heartbeat задача засыпает на HEARTBEAT_INTERVAL и записывает, насколько позже
+    она проснулась. Сторожевой поток следит за временем последнего пробуждения:
+    если loop не отвечает дольше порога, он снимает стек потока loop
+    (sys._current_frames) - это и есть место блокирующего вызова.
+    """
+
+    def __init__(self, stall_ms: int):
+        """Инициализация монитора; stall_ms - порог, после которого снимается стек"""
+        self.stall_seconds = stall_ms / 1000
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Запустить heartbeat в loop и сторожевой поток. Вызывать из потока loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        logger.info("🩺 Контроль event loop запущен (порог %d мс)", self.stall_seconds * 1000)
+
+    async def stop(self):
+        """Остановить heartbeat и сторожевой поток"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        """Периодически измерять задержку пробуждения"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            if lag >= self.stall_seconds:
+                logger.warning("🐢 Event loop был заблокирован %.0f мс", lag * 1000)
+
+    def _watch(self):
+        """Сторожевой поток: снимок стека, пока loop заблокирован"""
+        reported_beat = None
+        while not self._stop.wait(self.stall_seconds / 2):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - HEARTBEAT_INTERVAL
+            # Один снимок на каждую блокировку
+            if stalled < self.stall_seconds or reported_beat == last_beat:
+                continue
+
+            reported_beat = last_beat
+            LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame, limit=STACK_DEPTH)) if frame else 'стек недоступен\n'
+            logger.warning(
+                "🧱 Event loop не отвечает уже %.0f мс, стек потока loop:\n%s",
+                stalled * 1000, stack.rstrip()
+            )
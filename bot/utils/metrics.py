@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики в формате Prometheus и HTTP эндпоинт для их сбора
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .logging_setup import ACCESS_LOGGER
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(ACCESS_LOGGER)
+
+# Границы бакетов по умолчанию (секунды): от 1 мс до 30 с
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Сформировать блок меток {name="value",...}"""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    """Значение счётчика для конкретного набора меток"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild:
+    """Значение gauge для конкретного набора меток"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class _HistogramChild:
+    """Гистограмма для конкретного набора меток"""
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Последний элемент - бакет +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric(ABC):
+    """Базовый класс метрики с метками"""
+    kind = ''
+    child_class: Callable = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values) -> object:
+        """Получить значение для набора меток. Ссылку стоит сохранить вне горячего пути."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Строки значений в текстовом формате Prometheus"""
+
+    def render(self) -> str:
+        """Метрика целиком в текстовом формате Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+    kind = 'counter'
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1.0):
+        self._default.value += amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {child.value}"
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Текущее значение; может вычисляться функцией в момент сбора"""
+    kind = 'gauge'
+    child_class = _GaugeChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._default.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Вычислять значение функцией при каждом сборе метрик"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                self._default.value = self._function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name}: {e}")
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {child.value}"
+            for key, child in self._children.items()
+        ]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными бакетами"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {child.sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Реестр всех метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Зарегистрировать метрику (повторная регистрация возвращает существующую)"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+# Обработчики команд
+HANDLER_LATENCY = REGISTRY.histogram(
+    'tarot_handler_latency_seconds', 'Время обработки команды', ['command'])
+HANDLER_ERRORS = REGISTRY.counter(
+    'tarot_handler_errors_total', 'Необработанные исключения в обработчиках', ['command'])
+
+# Хранилище
+DB_LOAD_SECONDS = REGISTRY.histogram(
+    'tarot_db_load_seconds', 'Время загрузки базы пользователей')
+DB_SAVE_SECONDS = REGISTRY.histogram(
+    'tarot_db_save_seconds', 'Время сохранения базы пользователей')
+DB_FILE_BYTES = REGISTRY.gauge(
+    'tarot_db_file_bytes', 'Размер файла базы пользователей')
+
+# AI
+AI_LATENCY = REGISTRY.histogram(
+    'tarot_ai_request_seconds', 'Время запроса к модели', ['model'])
+AI_ERRORS = REGISTRY.counter(
+    'tarot_ai_errors_total', 'Ошибки запросов к модели', ['model'])
+AI_FALLBACKS = REGISTRY.counter(
+    'tarot_ai_fallbacks_total', 'Переходы на следующую модель после ошибки', ['model'])
+AI_EXHAUSTED = REGISTRY.counter(
+    'tarot_ai_exhausted_total', 'Запросы, для которых не ответила ни одна модель')
+
+# Предсказания по источнику толкования: ai / classic
+FORTUNES = REGISTRY.counter(
+    'tarot_fortunes_total', 'Выданные предсказания по источнику толкования', ['source'])
+# AI толкование не уложилось в AI_DEADLINE: upgraded - пришло позже и заменило классическое, failed - не пришло
+FORTUNE_UPGRADES = REGISTRY.counter(
+    'tarot_fortune_upgrades_total', 'Фоновые AI толкования после классического ответа', ['outcome'])
+SPREAD_READINGS = REGISTRY.counter(
+    'tarot_spreads_total', 'Выданные расклады по виду', ['kind'])
+
+# Ограничение частоты: scope - user (общий лимит), command (лимит команды) или inline (inline запросы)
+THROTTLED = REGISTRY.counter(
+    'tarot_throttled_updates_total', 'Отброшенные из-за лимита обновления', ['scope'])
+THROTTLE_BUCKETS = REGISTRY.gauge(
+    'tarot_throttle_buckets', 'Активные корзины лимитов в памяти')
+
+# Event loop
+LOOP_READY_QUEUE = REGISTRY.gauge(
+    'tarot_event_loop_ready_callbacks', 'Колбэки в очереди event loop, готовые к выполнению')
+LOOP_TASKS = REGISTRY.gauge(
+    'tarot_event_loop_tasks', 'Незавершённые asyncio задачи')
+LOOP_LAG = REGISTRY.histogram(
+    'tarot_event_loop_lag_seconds', 'Задержка пробуждения heartbeat задачи')
+LOOP_STALLS = REGISTRY.counter(
+    'tarot_event_loop_stalls_total', 'Блокировки event loop дольше порога')
+
+
+def instrument_handler(command: str, callback: Callable) -> Callable:
+    """Обернуть обработчик: гистограмма времени выполнения, счётчик ошибок и строка доступа"""
+    latency = HANDLER_LATENCY.labels(command)
+    errors = HANDLER_ERRORS.labels(command)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            latency.observe(elapsed)
+            if access_logger.isEnabledFor(logging.INFO):
+                user = getattr(update, 'effective_user', None)
+                access_logger.info(
+                    "%s обработан за %.1f мс", command, elapsed * 1000,
+                    extra={
+                        'command': command,
+                        'latency_ms': round(elapsed * 1000, 3),
+                        'user_id': user.id if user else None,
+                        'update_id': getattr(update, 'update_id', None),
+                    }
+                )
+
+    return wrapper
+
+
+def watch_event_loop(loop: asyncio.AbstractEventLoop):
+    """Считать глубину очереди event loop при каждом сборе метрик"""
+    LOOP_READY_QUEUE.set_function(lambda: len(getattr(loop, '_ready', ())))
+    LOOP_TASKS.set_function(lambda: len(asyncio.all_tasks(loop)))
+
+
+class MetricsServer:
+    """Минимальный HTTP сервер: GET /metrics отдаёт реестр в формате Prometheus"""
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Запустить сервер в текущем event loop"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"📈 Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Остановить сервер"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обработать одно HTTP соединение"""
+        try:
+            request_line = await reader.readline()
+            # Заголовки запроса не нужны, но их надо дочитать
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.registry.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'not found\n'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Ошибка запроса метрик: {e}")
+        finally:
+            writer.close()
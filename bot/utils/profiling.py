@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Профилирование работающего процесса по команде админа: cProfile и tracemalloc
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import re
+import time
+import tracemalloc
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Ограничения длительности снимка (секунды)
+DEFAULT_SECONDS = 30
+MAX_SECONDS = 300
+
+# Сколько строк выводить в отчёте
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+
+# Глубина стека, сохраняемая tracemalloc для каждого выделения
+TRACEMALLOC_FRAMES = 10
+
+
+def parse_duration(value: Optional[str]) -> Optional[int]:
+    """Длительность из аргумента команды: 30, 30s, 2m. None - если формат неверный."""
+    if not value:
+        return DEFAULT_SECONDS
+    match = re.fullmatch(r'(\d+)\s*(s|с|m|м)?', value.strip().lower())
+    if not match:
+        return None
+    seconds = int(match.group(1)) * (60 if match.group(2) in ('m', 'м') else 1)
+    return max(1, min(seconds, MAX_SECONDS))
+
+
+class Profiler:
+    """Снимки профиля в течение заданного окна; одновременно выполняется только один.
+
+    В простое ничего не включено: cProfile и tracemalloc запускаются на время снимка
+    и выключаются после него.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        # Резерв под снимок, запрошенный командой, но ещё не начатый (задача в фоне)
+        self._reserved = False
+
+    @property
+    def busy(self) -> bool:
+        """Снимок уже выполняется или зарезервирован"""
+        return self._reserved or self._lock.locked()
+
+    def try_acquire(self) -> bool:
+        """Зарезервировать профилировщик без ожидания. False, если он уже занят.
+
+        Синхронно, поэтому между проверкой и резервом не может вклиниться другая команда.
+        """
+        if self.busy:
+            return False
+        self._reserved = True
+        return True
+
+    def release(self):
+        """Снять резерв после снимка"""
+        self._reserved = False
+
+    async def capture_cpu(self, seconds: int) -> str:
+        """cProfile потока event loop за seconds секунд; отчёт - топ функций"""
+        async with self._lock:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            elapsed = time.perf_counter() - started
+
+            output = io.StringIO()
+            output.write(f"CPU профиль event loop за {elapsed:.1f} с\n\n")
+            stats = pstats.Stats(profile, stream=output).strip_dirs()
+            output.write(f"=== По собственному времени (tottime), топ {TOP_FUNCTIONS} ===\n")
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+            output.write(f"\n=== По суммарному времени (cumtime), топ {TOP_FUNCTIONS} ===\n")
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+            return output.getvalue()
+
+    async def capture_memory(self, seconds: int) -> str:
+        """Разница снимков tracemalloc в начале и в конце окна; отчёт - топ мест выделения"""
+        async with self._lock:
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+
+            filters = [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ]
+            before = before.filter_traces(filters)
+            after = after.filter_traces(filters)
+
+            output = io.StringIO()
+            output.write(f"Память за {seconds} с: отслежено {current / 1024:.0f} КБ, пик {peak / 1024:.0f} КБ\n\n")
+            output.write(f"=== Рост по местам выделения, топ {TOP_ALLOCATIONS} ===\n")
+            for stat in after.compare_to(before, 'lineno')[:TOP_ALLOCATIONS]:
+                output.write(f"{stat}\n")
+            output.write(f"\n=== Крупнейшие места выделения в конце окна, топ {TOP_ALLOCATIONS} ===\n")
+            for stat in after.statistics('lineno')[:TOP_ALLOCATIONS]:
+                output.write(f"{stat}\n")
+
+            largest = after.statistics('traceback')[:1]
+            if largest:
+                output.write("\n=== Стек крупнейшего места выделения ===\n")
+                output.write("\n".join(largest[0].traceback.format()) + "\n")
+            return output.getvalue()
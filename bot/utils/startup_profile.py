@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Профилирование запуска: время импорта модулей и готовность бота
+"""
+
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+def measure_imports(module: str = 'bot.bot') -> List[Tuple[int, int, str]]:
+    """Время импорта модулей в чистом интерпретаторе (python -X importtime).
+
+    Возвращает список (cumulative мкс, self мкс, модуль), отсортированный по убыванию cumulative.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+        except ValueError:
+            continue
+    return sorted(rows, reverse=True)
+
+
+def print_import_report(rows: List[Tuple[int, int, str]], top: int = 25):
+    """Вывести самые медленные импорты"""
+    print(f"\n📦 Импорт модулей (топ {top} по cumulative):")
+    print(f"{'cumulative мс':>14} {'self мс':>9}  модуль")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
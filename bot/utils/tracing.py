@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Лёгкая трассировка: span на каждое обновление, передаваемый через contextvars
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('tarot_current_span', default=None)
+
+
+class Span:
+    """Один участок работы внутри обработки обновления"""
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent', 'attributes',
+                 'start_ns', 'end_ns', 'error', 'children', 'sampled')
+
+    def __init__(self, name: str, trace_id: str, parent: Optional['Span'], attributes: Dict[str, Any],
+                 sampled: bool):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self.children: List['Span'] = []
+        self.sampled = sampled
+
+    @property
+    def duration_ms(self) -> float:
+        """Длительность span в миллисекундах"""
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        """Добавить атрибут к span"""
+        self.attributes[key] = value
+
+    def walk(self) -> Iterator['Span']:
+        """Обойти дерево span в порядке начала"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Запись span в OTLP-подобном JSON формате"""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent.span_id if self.parent else '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': {'code': 'ERROR', 'message': self.error} if self.error else {'code': 'OK'},
+        }
+
+    def format_tree(self, depth: int = 0) -> str:
+        """Текстовое дерево span для журнала медленных запросов"""
+        attributes = f" {self.attributes}" if self.attributes else ''
+        error = f" ❌ {self.error}" if self.error else ''
+        lines = [f"{'  ' * depth}{self.name} {self.duration_ms:.1f} мс{attributes}{error}"]
+        lines.extend(child.format_tree(depth + 1) for child in self.children)
+        return '\n'.join(lines)
+
+
+class JsonlSpanExporter:
+    """Запись завершённых трасс в файл: одна строка JSON на span.
+
+    export() только ставит трассу в очередь: сериализация и запись файла выполняются
+    в фоновом потоке пачками, как записи журнала в QueueListener, и не блокируют event loop.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # None в очереди - сигнал остановки
+        self._queue: 'queue.SimpleQueue[Optional[Span]]' = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, root: Span):
+        """Поставить трассу в очередь на запись"""
+        self._queue.put(root)
+
+    def _run(self):
+        """Поток записи: забрать все накопившиеся трассы и дописать их одной операцией"""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = ''.join(
+                json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n'
+                for root in batch if root is not None
+                for span in root.walk()
+            )
+            if lines:
+                try:
+                    with open(self.filename, 'a', encoding='utf-8') as f:
+                        f.write(lines)
+                except OSError as e:
+                    logger.error(f"❌ Ошибка экспорта трасс: {e}")
+            if None in batch:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Дописать очередь и остановить поток"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class Tracer:
+    """Трассировщик: выборка трасс, экспорт и журнал медленных запросов"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.slow_threshold_ms = 0
+        self.exporter: Optional[JsonlSpanExporter] = None
+
+    def configure(self, sample_rate: float, slow_threshold_ms: int, filename: Optional[str]):
+        """Включить трассировку. При нулевой выборке и пороге трассировка выключена."""
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.slow_threshold_ms = slow_threshold_ms
+        self.close()
+        self.exporter = JsonlSpanExporter(filename) if filename and self.sample_rate > 0 else None
+        self.enabled = self.sample_rate > 0 or slow_threshold_ms > 0
+        if self.enabled:
+            logger.info(f"🧵 Трассировка включена: выборка {self.sample_rate:.0%}, порог {slow_threshold_ms} мс")
+
+    def close(self):
+        """Дописать трассы из очереди экспорта и остановить его поток"""
+        if self.exporter:
+            self.exporter.close()
+            self.exporter = None
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Корневой span обновления. Без включённой трассировки ничего не делает."""
+        if not self.enabled:
+            yield None
+            return
+
+        sampled = random.random() < self.sample_rate
+        root = Span(name, os.urandom(16).hex(), None, attributes, sampled)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(root)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Дочерний span. Вне корневого span ничего не делает."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        child = Span(name, parent.trace_id, parent, attributes, parent.sampled)
+        parent.children.append(child)
+        token = _current_span.set(child)
+        try:
+            yield child
+        except BaseException as e:
+            child.error = repr(e)
+            raise
+        finally:
+            child.end_ns = time.time_ns()
+            _current_span.reset(token)
+
+    def _finish(self, root: Span):
+        """Экспортировать трассу и записать медленный запрос"""
+        if self.slow_threshold_ms and root.duration_ms >= self.slow_threshold_ms:
+            logger.warning(f"🐢 Медленный запрос {root.name}: {root.duration_ms:.0f} мс\n{root.format_tree()}")
+
+        if root.sampled and self.exporter:
+            try:
+                self.exporter.export(root)
+            except Exception as e:
+                logger.error(f"❌ Ошибка экспорта трассы: {e}")
+
+
+TRACER = Tracer()
+
+
+def span(name: str, **attributes):
+    """Дочерний span глобального трассировщика"""
+    return TRACER.span(name, **attributes)
+
+
+def traced(name: str) -> Callable:
+    """Декоратор: выполнить функцию (обычную или async) внутри span"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with TRACER.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def trace_handler(command: str, callback: Callable) -> Callable:
+    """Обернуть обработчик корневым span обновления"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        if not TRACER.enabled:
+            return await callback(update, context)
+
+        user = getattr(update, 'effective_user', None)
+        with TRACER.trace(command, update_id=update.update_id, user_id=user.id if user else None):
+            return await callback(update, context)
+
+    return wrapper
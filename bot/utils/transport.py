@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP транспорт для Bot API: отдельные пулы соединений для getUpdates и остальных вызовов
+"""
+
+import importlib.util
+import logging
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+# Long polling держит одно соединение; второе нужно только на время переподключения
+GET_UPDATES_POOL_SIZE = 2
+
+
+def http2_available() -> bool:
+    """Установлен ли пакет h2 (pip install "httpx[http2]")"""
+    return importlib.util.find_spec('h2') is not None
+
+
+def build_request(config: Config, get_updates: bool = False) -> HTTPXRequest:
+    """Запрос Bot API с настройками из конфигурации.
+
+    getUpdates получает собственный маленький пул: долгий опрос не занимает соединения,
+    нужные для sendMessage/editMessageText, и не ждёт их освобождения.
+    """
+    pool_size = GET_UPDATES_POOL_SIZE if get_updates else config.telegram_pool_size
+    http_version = '2' if config.telegram_http2 and http2_available() else '1.1'
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size if config.telegram_keepalive > 0 else 0,
+        keepalive_expiry=config.telegram_keepalive or None,
+    )
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=config.telegram_connect_timeout,
+        read_timeout=config.telegram_read_timeout,
+        write_timeout=config.telegram_write_timeout,
+        pool_timeout=config.telegram_pool_timeout,
+        http_version=http_version,
+        httpx_kwargs={'limits': limits},
+    )
+
+
+def describe(config: Config) -> str:
+    """Краткое описание транспорта для журнала запуска"""
+    if config.telegram_http2 and not http2_available():
+        logger.warning("⚠️ TELEGRAM_HTTP2 включён, но пакет h2 не установлен - используется HTTP/1.1")
+    http_version = 'HTTP/2' if config.telegram_http2 and http2_available() else 'HTTP/1.1'
+    keepalive = f"{config.telegram_keepalive:g} с" if config.telegram_keepalive > 0 else "выключен"
+    return f"{http_version}, пул {config.telegram_pool_size}, keep-alive {keepalive}"
@@ -5,28 +5,67 @@ Telegram Tarot Fortune Bot
 Главная точка входа в приложение
 """
 
+import time
+_STARTED = time.perf_counter()
+
+import argparse
 import logging
-import asyncio
+import os
 from bot.config import Config
 from bot.bot import TarotBot
+from bot.utils.logging_setup import setup_logging as configure_logging
+
+_IMPORTED = time.perf_counter()
 
 def setup_logging():
-    """Настройка логирования"""
-    logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO
+    """Настройка логирования (LOG_MODE: plain | async | json)"""
+    return configure_logging(
+        mode=os.getenv('LOG_MODE', 'plain'),
+        level=os.getenv('LOG_LEVEL', 'INFO'),
+        sample=os.getenv('LOG_SAMPLE')
     )
 
+def parse_args():
+    """Аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Telegram Tarot Fortune Bot")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="загружать openai и AI клиент в фоне после запуска (то же, что FAST_START=1)")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="показать время импорта модулей и готовности, не запуская бота")
+    return parser.parse_args()
+
+def profile_startup(config: Config):
+    """Отчёт о времени запуска без подключения к Telegram"""
+    from bot.utils.startup_profile import measure_imports, print_import_report
+
+    built_start = time.perf_counter()
+    TarotBot(config)
+    built = time.perf_counter()
+
+    print_import_report(measure_imports())
+    print(f"\n⏱️  Импорт в этом процессе: {(_IMPORTED - _STARTED) * 1000:.0f} мс")
+    print(f"⏱️  Создание TarotBot: {(built - built_start) * 1000:.0f} мс")
+    print(f"⏱️  Готовность к polling (без сети): {(built - _STARTED) * 1000:.0f} мс")
+    print(f"🚀 Быстрый старт: {'включён' if config.fast_start else 'выключен'}")
+
 def main():
     """Главная функция запуска бота"""
+    args = parse_args()
+    if args.fast_start:
+        os.environ['FAST_START'] = '1'
+    
     # Настроить логирование
-    setup_logging()
+    log_listener = setup_logging()
     logger = logging.getLogger(__name__)
     
     try:
         # Загрузить конфигурацию
         config = Config()
         
+        if args.profile_startup:
+            profile_startup(config)
+            return
+        
         # Создать и запустить бота
         bot = TarotBot(config)
         
@@ -38,6 +77,10 @@ def main():
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")
         raise
+    finally:
+        # Дописать записи, оставшиеся в очереди логов
+        if log_listener:
+            log_listener.stop()
 
 if __name__ == '__main__':
     main()